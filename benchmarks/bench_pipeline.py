@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import write_synthetic_catalog
+from models.catalog import load_catalog
+from models.model import load_llm_model, parse_models_by_type
+from models.table import ModelTable
+from utils import calculations, compiled, plotting, vectorized
+from utils.result_cache import CALC_VERSION
+
+# Times every stage of the analysis pipeline on synthetic catalogs of increasing size and writes the timings as JSON,
+# so runs can be compared across commits. Also checks that the vectorized and compiled paths reproduce the scalar
+# utils/calculations.py results exactly. Run from the repository root:
+#     python -m benchmarks.bench_pipeline --sizes 3 1000 100000 --output bench.json
+
+SIZES = (3, 100, 1000, 10000, 100000)
+SCALAR_MODELS = 100  # the scalar path is timed on at most this many models per catalog
+USERS = np.arange(1, 257, 8)
+HARDWARE = {"weight_density": 0.02, "weight_tiers": 64, "kv_density": 0.034, "act_density": 0.034, "tmacs_per_mm2": 1.352}
+W_RES, ACT_RES = [8], [8]
+
+# function name -> argument names, in the signature order of utils/calculations.py
+CALC_FUNCTIONS = {
+    "calculate_total_params": (),
+    "calculate_total_KV_cache_size": ("users",),
+    "calculate_activations": ("input_len", "users"),
+    "calculate_total_flops": ("input_len", "users"),
+    "calculate_total_mem_transfer": ("input_len", "users"),
+}
+
+
+def timed(fn, repeat=3):
+    # best wall time of repeat runs and the last result
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def cold(fn):
+    # runs fn with the model invariant cache of utils/calculations.py emptied first
+    calculations.clear_model_cache()
+    return fn()
+
+
+def record(seconds, points):
+    return {"seconds": seconds, "points": points, "per_point_us": seconds / max(points, 1) * 1e6}
+
+
+def scalar_chip_requirements(models):
+    # the per-point loop plot_model_chip_requirements used before it was vectorized
+    areas = []
+    for model in models:
+        total_params = calculations.calculate_total_params(model)[0]
+        for users in USERS:
+            for weight_res, activation_res in zip(W_RES, ACT_RES):
+                kv_cache = calculations.calculate_total_KV_cache_size(model, users)[0]
+                act_storage = calculations.calculate_activations(model, model.context_len * 0.5, users)[0]
+                weight_storage = (weight_res / 8) * total_params * (1 / HARDWARE["weight_density"]) / HARDWARE["weight_tiers"]
+                kv_storage = (activation_res / 8) * kv_cache * (1 / HARDWARE["kv_density"])
+                act_storage = (activation_res / 8) * act_storage * (1 / HARDWARE["act_density"])
+                peak_flops = calculations.calculate_total_flops(model, model.context_len * 0.5, users)[0]
+                compute_area = 2 * peak_flops / 1000 / HARDWARE["tmacs_per_mm2"]
+                areas.append(max(kv_storage + act_storage + compute_area, weight_storage))
+    return np.array(areas)
+
+
+def _flatten(value):
+    if isinstance(value, (list, tuple)):
+        return [item for entry in value for item in _flatten(entry)]
+    return [value]
+
+
+def check_equivalence(table, models):
+    # exact comparison of every output of every calculation function, plus the compiled polynomials
+    mismatches = {}
+    sample = table[:len(models)].broadcast(1)
+    args = {"users": USERS[None, :], "input_len": sample.context_len * 0.5}
+    for name, arg_names in CALC_FUNCTIONS.items():
+        fast = _flatten(getattr(vectorized, name)(sample, *(args[arg] for arg in arg_names)))
+        bad = 0
+        for m, model in enumerate(models):
+            for u, users in enumerate(USERS):
+                scalar_args = {"users": users, "input_len": model.context_len * 0.5}
+                reference = _flatten(getattr(calculations, name)(model, *(scalar_args[arg] for arg in arg_names)))
+                bad += sum(np.broadcast_to(value, (len(models), len(USERS)))[m, u] != expected for value, expected in zip(fast, reference))
+        mismatches[name] = int(bad)
+
+    polynomials = compiled.evaluate(compiled.compile_models(sample), USERS[None, :], args["input_len"], quantities=("peak_flops", "act_max"))
+    mismatches["compiled.peak_flops"] = int(np.count_nonzero(polynomials["peak_flops"] != vectorized.calculate_total_flops(sample, args["input_len"], USERS[None, :])[0]))
+    mismatches["compiled.act_max"] = int(np.count_nonzero(polynomials["act_max"] != vectorized.calculate_activations(sample, args["input_len"], USERS[None, :])[0]))
+    return mismatches
+
+
+def bench_catalog(num_models, workdir, repeat=3, plot=True):
+    path = write_synthetic_catalog(os.path.join(workdir, f"models_{num_models}.json"), num_models)
+    entry = {"models": num_models}
+
+    seconds, json_data = timed(lambda: load_llm_model(path), repeat)
+    entry["load_json"] = record(seconds, num_models)
+    seconds, by_type = timed(lambda: parse_models_by_type(json_data), repeat)
+    entry["build_objects"] = record(seconds, num_models)
+    seconds, table = timed(lambda: ModelTable.from_json(json_data), repeat)
+    entry["build_table"] = record(seconds, num_models)
+    seconds, _ = timed(lambda: load_catalog(path, cache=False), repeat)
+    entry["stream_catalog"] = record(seconds, num_models)
+    load_catalog(path)
+    seconds, catalog = timed(lambda: load_catalog(path), repeat)
+    entry["load_catalog_cached"] = record(seconds, num_models)
+
+    models = [model for family in by_type.values() for model in family][:SCALAR_MODELS]
+    scalar_points = len(models) * len(USERS)
+    points = len(table) * len(USERS)
+    broadcast_table = table.broadcast(1)
+    input_len = broadcast_table.context_len * 0.5
+
+    for name, arg_names in CALC_FUNCTIONS.items():
+        scalar_fn = getattr(calculations, name)
+
+        def scalar_loop():
+            for model in models:
+                for users in USERS:
+                    scalar_args = {"users": users, "input_len": model.context_len * 0.5}
+                    scalar_fn(model, *(scalar_args[arg] for arg in arg_names))
+
+        # cold: every run starts from an empty model cache; warm: the invariants of every model are already cached
+        seconds, _ = timed(lambda: cold(scalar_loop), repeat)
+        entry[f"scalar.{name}"] = record(seconds, scalar_points)
+        seconds, _ = timed(scalar_loop, repeat)
+        entry[f"scalar_warm.{name}"] = record(seconds, scalar_points)
+        args = {"users": USERS[None, :], "input_len": input_len}
+        seconds, _ = timed(lambda: getattr(vectorized, name)(broadcast_table, *(args[arg] for arg in arg_names)), repeat)
+        entry[f"vectorized.{name}"] = record(seconds, points)
+
+    seconds, coefficients = timed(lambda: compiled.compile_models(table), repeat)
+    entry["compiled.compile"] = record(seconds, num_models)
+    seconds, _ = timed(lambda: compiled.evaluate(coefficients.broadcast(1), USERS[None, :], input_len), repeat)
+    entry["compiled.evaluate"] = record(seconds, points)
+
+    seconds, scalar_areas = timed(lambda: cold(lambda: scalar_chip_requirements(models)), repeat)
+    entry["sweep.scalar"] = record(seconds, scalar_points)
+    seconds, _ = timed(lambda: scalar_chip_requirements(models), repeat)
+    entry["sweep.scalar_warm"] = record(seconds, scalar_points)
+    seconds, data = timed(lambda: plotting.chip_requirements(table, *HARDWARE.values(), W_RES, ACT_RES, user_range=USERS), repeat)
+    entry["sweep.vectorized"] = record(seconds, points)
+
+    if plot:
+        output_path = os.path.join(workdir, f"chip_requirements_{num_models}.png")
+        seconds, _ = timed(lambda: plotting.plot_model_chip_requirements(table, *HARDWARE.values(), W_RES, ACT_RES, output_path=output_path), 1)
+        entry["plot"] = record(seconds, points)
+
+    mismatches = check_equivalence(table, models)
+    mismatches["sweep"] = int(np.count_nonzero(scalar_areas != data["total_area"][:scalar_points]))
+    catalog_table = catalog.table()
+    mismatches["catalog"] = int(np.count_nonzero(catalog_table._data != table._data) + np.count_nonzero(catalog_table.name != table.name))
+    entry["mismatches"] = mismatches
+    return entry
+
+
+def run(sizes=SIZES, output="bench_results.json", repeat=3, plot=True):
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "calc_version": CALC_VERSION,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for num_models in sizes:
+            entry = bench_catalog(num_models, workdir, repeat, plot)
+            report["results"].append(entry)
+            print(f"{num_models:>7} models: sweep scalar {entry['sweep.scalar']['per_point_us']:.2f} us/pt cold, "
+                  f"{entry['sweep.scalar_warm']['per_point_us']:.2f} us/pt warm, vectorized {entry['sweep.vectorized']['per_point_us']:.3f} us/pt, mismatches {sum(entry['mismatches'].values())}")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chip-requirement analysis pipeline on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="catalog sizes (number of models)")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file the timings are written to")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the best time is kept")
+    parser.add_argument("--no-plot", action="store_true", help="skip the plotting stage")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.output, args.repeat, not args.no_plot)
+    # non-zero exit when a fast path disagrees with the scalar code
+    return 1 if any(sum(entry["mismatches"].values()) for entry in report["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from models.model import FIELD_KEYS, load_llm_model
+
+# Synthetic model zoo in the data/models.json schema: architecture variants scattered around the real catalog so that
+# benchmark catalogs of any size exercise realistic magnitudes.
+
+MODELS_PER_FAMILY = 1000
+
+
+def synthetic_catalog(num_models, base_path="data/models.json", seed=0):
+    base = [model for model_type in load_llm_model(base_path)["model_types"] for model in model_type["models"]]
+    if num_models <= len(base):
+        return {"model_types": [{"model_name": "Synthetic", "models": base[:num_models]}]}
+
+    rng = np.random.default_rng(seed)
+    template = np.array([[model.get(key, 0) for key in FIELD_KEYS.values()] for model in base])[rng.integers(0, len(base), num_models)]
+    columns = dict(zip(FIELD_KEYS, template.T))
+
+    # perturb the architecture while keeping the shapes consistent (emb_dim = heads * head_dim, kv heads divide heads)
+    columns["layers"] = np.maximum(1, np.round(columns["layers"] * rng.uniform(0.5, 1.5, num_models))).astype(np.int64)
+    heads = np.maximum(1, columns["num_attention_heads"] // 2 ** rng.integers(0, 3, num_models))
+    columns["num_attention_heads"] = heads
+    columns["num_kv_heads"] = np.maximum(1, np.minimum(columns["num_kv_heads"], heads))
+    columns["emb_dim"] = heads * columns["head_dim"]
+    columns["ffn_dim"] = (np.round(columns["emb_dim"] * rng.uniform(2.5, 4.0, num_models) / 256) * 256).astype(np.int64)
+    columns["max_context_len"] = np.where(columns["max_context_len"] > 0, columns["max_context_len"], 128000)
+
+    model_types = []
+    for start in range(0, num_models, MODELS_PER_FAMILY):
+        models = []
+        for i in range(start, min(start + MODELS_PER_FAMILY, num_models)):
+            model = {"name": f"Synthetic-{i}"}
+            model.update({key: int(columns[field][i]) for field, key in FIELD_KEYS.items()})
+            models.append(model)
+        model_types.append({"model_name": f"Synthetic-{start // MODELS_PER_FAMILY}", "models": models})
+    return {"model_types": model_types}
+
+
+def write_synthetic_catalog(path, num_models, seed=0):
+    with open(path, "w") as f:
+        json.dump(synthetic_catalog(num_models, seed=seed), f)
+    return path
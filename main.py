@@ -1,41 +1,276 @@
-from models.model import LLMModel, load_llm_model, parse_models_by_type
-from utils import calculations
-from utils import plotting
+import argparse
+import sys
+
+# Only the standard library is imported at startup: NumPy and matplotlib are imported by the subcommands that need
+# them, so "report" (pure Python) starts in tens of milliseconds and can be scripted in a loop.
+#   python main.py report --family LLama3.1 --users 256
+#   python main.py solve --model LLama3-405B --variable users --chips 16
+#   python main.py partition --model LLama3-405B --users 8 --chip-size 800
+#   python main.py precision --model LLama3-70B --users 1 64 --kv-res 4 8 16 --act-res 8
+#   python main.py sweep --out data/sweep --weight-density 0.01 0.02 0.04 --w-res 4 8
+#   python main.py plot --family LLama3.1 --pareto
+# Running without a subcommand plots the LLama3.1 family, as before.
+
 CONTEXT_LEN = 2048
 INPUT_LEN = 1024
 USERS = 256
 
-if __name__ == "__main__":
-    json_data = load_llm_model("data/models.json")
-    llama3_models = []
-    for model_type in json_data["model_types"]:
-        if model_type["model_name"] == "LLama3.1":
-            for model_data in model_type["models"]:
-                llama3_models.append(LLMModel(**model_data))
-
-    # Parameters
-    weight_density = 0.02  # GB/mm²
-    weight_tiers = 64
-    kv_density = 0.034     # GB/mm²
-    act_density = 0.034    # GB/mm²
-    tmacs_per_mm2 = 1.352   # TMACs/mm²
-    w_res = [8]
-    act_res = [8]
-
-    plotting.plot_model_chip_requirements(llama3_models, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res)
-    """
-    models = parse_models_by_type(model_config)
-    
-    for model_type, model in models.items():
+MODELS_PATH = "data/models.json"
+FAMILY = "LLama3.1"
+
+# Parameters
+HARDWARE = {
+    "weight_density": 0.02,  # GB/mm²
+    "weight_tiers": 64,
+    "kv_density": 0.034,     # GB/mm²
+    "act_density": 0.034,    # GB/mm²
+    "tmacs_per_mm2": 1.352,  # TMACs/mm²
+}
+W_RES = 8
+ACT_RES = 8
+
+
+def load_models(args):
+    # (catalog, [(family, catalog rows), ...]) for the selected families, optionally narrowed to the named models
+    from models.catalog import load_catalog
+
+    catalog = load_catalog(args.models, cache=not args.no_catalog_cache)
+    families = catalog.families() if "all" in args.family else args.family
+    unknown = [family for family in families if family not in catalog.families()]
+    if unknown:
+        raise SystemExit(f"unknown model family {', '.join(unknown)}; available: {', '.join(catalog.families())}")
+    if not args.model:
+        return catalog, [(family, catalog.family_rows(family)) for family in families]
+
+    # name lookups go through the catalog index instead of scanning the families
+    selected = [(family, [catalog.index(name, family) for name in args.model if (family, name) in catalog]) for family in families]
+    found = {catalog.names[row] for _, rows in selected for row in rows}
+    missing = [name for name in args.model if name not in found]
+    if missing:
+        raise SystemExit(f"model {', '.join(missing)} not found in the selected families")
+    return catalog, [(family, rows) for family, rows in selected if rows]
+
+
+def model_objects(catalog, selection):
+    # [(family, [LLMModel, ...]), ...] for the commands that run the scalar code model by model
+    return [(family, [catalog[row] for row in rows]) for family, rows in selection]
+
+
+def model_table(catalog, selection):
+    # ModelTable of the selected rows over the catalog column block; a contiguous selection (whole families in catalog
+    # order) is a view, anything else one gather
+    import numpy as np
+
+    table = catalog.table()
+    rows = np.fromiter((row for _, family_rows in selection for row in family_rows), dtype=np.intp)
+    if len(rows) and rows[-1] - rows[0] + 1 == len(rows) and np.all(np.diff(rows) == 1):
+        return table[rows[0]:rows[-1] + 1]
+    return table.take(rows)
+
+
+def hardware_axes(args):
+    kv_res = args.act_res if args.kv_res is None else args.kv_res
+    return dict({name: getattr(args, name) for name in HARDWARE}, w_res=args.w_res, act_res=args.act_res, kv_res=kv_res)
+
+
+def report(args, catalog, selection):
+    from utils import calculations
+
+    for model_type, models in model_objects(catalog, selection):
         print(f"Model: {model_type}")
-        for model_name in model:
+        for model_name in models:
+            input_len = model_name.context_len * 0.5 if args.input_len is None else args.input_len
             model_name.display()
             print(f"  Number of Parameters: {calculations.calculate_total_params(model_name)} GB")
-            print(f"  KV Memory: {calculations.calculate_total_KV_cache_size(model_name, USERS)} GB")
-            print(f"  Number of FLOPs: {calculations.calculate_total_flops(model_name, model_name.context_len * 0.5, USERS)} GFLOPs")
-            print(f"  Total Memory Transfer: {calculations.calculate_total_mem_transfer(model_name,  model_name.context_len * 0.5, USERS)} GB")
-            print(f"  Memory Storage Requirement: {calculations.calculate_storage(model_name, 8, 8,  model_name.context_len * 0.5, USERS)} GB")
-            # print(f"  Name: {model_name.name}")
-    """
-    
+            print(f"  KV Memory: {calculations.calculate_total_KV_cache_size(model_name, args.users)} GB")
+            print(f"  Number of FLOPs: {calculations.calculate_total_flops(model_name, input_len, args.users)} GFLOPs")
+            print(f"  Total Memory Transfer: {calculations.calculate_total_mem_transfer(model_name, input_len, args.users)} GB")
+            print(f"  Memory Storage Requirement: {calculations.calculate_storage(model_name, args.w_res, args.act_res, input_len, args.users, args.kv_res)} GB")
+
+
+def solve(args, catalog, selection):
+    from utils.solver import solve_max
+
+    hardware = hardware_axes(args)
+    for model_type, models in model_objects(catalog, selection):
+        for model in models:
+            result = solve_max(model, args.variable, hardware, chips=args.chips, area=args.area, users=args.users,
+                               input_len=args.input_len, chip_size=args.chip_size)
+            print(f"{model_type} {model.name}: max {args.variable} = {result.value} (binding: {result.binding}, "
+                  f"total area {result.total_area:.1f} mm², weight {result.weight_area:.1f} mm², "
+                  f"SRAM + compute {result.sram_compute_area:.1f} mm²)")
+
+
+def partition(args, catalog, selection):
+    from utils.partition import layer_assignment, partition_layers
+
+    for model_type, models in model_objects(catalog, selection):
+        for model in models:
+            input_len = model.context_len * 0.5 if args.input_len is None else args.input_len
+            result = partition_layers(model, args.users, input_len, *(getattr(args, name) for name in HARDWARE), args.w_res,
+                                      args.act_res, args.kv_res, chip_size=args.chip_size)
+            if result.num_chips == float("inf"):
+                print(f"{model_type} {model.name}: does not fit {args.chip_size:g} mm² chips layer by layer")
+                continue
+            stages = ", ".join(f"{start}-{stop - 1}" if stop > start else "FLL only"
+                               for start, stop in layer_assignment(model.layers, result.num_chips, result.head_layers))
+            print(f"{model_type} {model.name}: {result.num_chips:.0f} chips, bottleneck stage {result.bottleneck_area:.1f} mm² "
+                  f"(layers per chip: {stages}; FLL on the last chip)")
+
 
+def precision(args, catalog, selection):
+    from utils.precision import flatten, precision_sweep
+
+    models = model_table(catalog, selection)
+    kv_res = args.act_res if args.kv_res is None else args.kv_res
+    results = flatten(precision_sweep(models, args.w_res, kv_res, args.act_res, *(getattr(args, name) for name in HARDWARE),
+                                      args.users, args.context_len, args.input_len, args.chip_size))
+    print(f"{'model':<14}{'users':>7}{'context':>9}{'w/kv/act':>10}{'weight mm²':>13}{'KV$ mm²':>13}{'act mm²':>13}"
+          f"{'compute mm²':>13}{'total mm²':>13}{'chips':>8}")
+    for row in range(len(results["total_area"])):
+        context = "model" if args.context_len is None else f"{results['context_len'][row]:.0f}"
+        bits = f"{results['w_res'][row]:.0f}/{results['kv_res'][row]:.0f}/{results['act_res'][row]:.0f}"
+        print(f"{results['model'][row]:<14}{results['users'][row]:>7}{context:>9}{bits:>10}{results['weight_area'][row]:>13.1f}"
+              f"{results['kv_area'][row]:>13.1f}{results['act_area'][row]:>13.1f}{results['compute_area'][row]:>13.1f}"
+              f"{results['total_area'][row]:>13.1f}{results['num_chips'][row]:>8.0f}")
+
+
+def sweep(args, catalog, selection):
+    from utils.dse import DEFAULT_USERS, SweepMismatchError, run_sweep
+
+    table = model_table(catalog, selection)
+    users = DEFAULT_USERS if args.users is None else args.users
+    cache = None
+    if args.cache:
+        from utils.result_cache import ResultCache
+        cache = ResultCache()
+    try:
+        computed = run_sweep(table, hardware_axes(args), args.out, users, args.input_len, args.chunk_size, args.workers, args.format,
+                             cache=cache)
+    except SweepMismatchError as error:
+        raise SystemExit(f"{error}; pass a new --out directory or rerun with the original grid") from None
+    print(f"{computed} chunks computed in {args.out}")
+
+
+def plot(args, catalog, selection):
+    from utils import plotting
+
+    cache = None
+    if args.cache:
+        from utils.result_cache import ResultCache
+        cache = ResultCache()
+    plotting.plot_model_chip_requirements(model_table(catalog, selection), *(getattr(args, name) for name in HARDWARE), args.w_res, args.act_res,
+                                          user_range=args.users, output_path=args.output, show=args.show,
+                                          cache=cache, pareto=args.pareto, kv_res=args.kv_res)
+    print(f"Chip requirements plotted to {args.output}")
+
+
+def add_hardware_arguments(parser, sweep=False):
+    # one value per hardware parameter, or a list of values per axis for sweeps
+    for name, value in HARDWARE.items():
+        parser.add_argument("--" + name.replace("_", "-"), dest=name, type=type(value), nargs="+" if sweep else None,
+                            default=[value] if sweep else value, help=f"default {value}")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--models", default=MODELS_PATH, help=f"model catalog, JSON or JSONL (default {MODELS_PATH})")
+    common.add_argument("--family", nargs="+", default=[FAMILY], help=f"model families, or all (default {FAMILY})")
+    common.add_argument("--model", nargs="+", help="only these model names")
+    common.add_argument("--no-catalog-cache", action="store_true", help="parse the catalog without reading or writing its binary sidecar")
+    common.add_argument("--profile", action="store_true", help="print per-stage and per-function timings at exit")
+    common.add_argument("--profile-output", help="also write the profile report as JSON")
+    common.add_argument("--cprofile", help="also dump a cProfile profile")
+
+    parser = argparse.ArgumentParser(description="Chip area, storage and compute analysis of LLM models.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_report = commands.add_parser("report", parents=[common], help="per-model parameters, KV$, FLOPs, memory transfer and storage")
+    parser_report.add_argument("--users", type=int, default=USERS, help=f"number of users (default {USERS})")
+    parser_report.add_argument("--input-len", type=float, help="prefill input length (default half the model context length)")
+    parser_report.add_argument("--w-res", type=int, default=W_RES, help="weight resolution in bits")
+    parser_report.add_argument("--act-res", type=int, default=ACT_RES, help="activation resolution in bits")
+    parser_report.add_argument("--kv-res", type=int, help="KV$ resolution in bits (default the activation resolution)")
+    parser_report.set_defaults(func=report)
+
+    parser_solve = commands.add_parser("solve", parents=[common], help="largest users / input length / context length that fits a chip budget")
+    parser_solve.add_argument("--variable", choices=("users", "input_len", "context_len"), default="users")
+    budget = parser_solve.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--chips", type=int, help="chip budget")
+    budget.add_argument("--area", type=float, help="area budget in mm²")
+    parser_solve.add_argument("--chip-size", type=float, default=800, help="chip size in mm² (default 800, a reticle)")
+    parser_solve.add_argument("--users", type=int, default=1, help="number of users when solving for input_len or context_len")
+    parser_solve.add_argument("--input-len", type=float, help="prefill input length (default half the model context length)")
+    add_hardware_arguments(parser_solve)
+    parser_solve.add_argument("--w-res", type=int, default=W_RES, help="weight resolution in bits")
+    parser_solve.add_argument("--act-res", type=int, default=ACT_RES, help="activation resolution in bits")
+    parser_solve.add_argument("--kv-res", type=int, help="KV$ resolution in bits (default the activation resolution)")
+    parser_solve.set_defaults(func=solve)
+
+    parser_partition = commands.add_parser("partition", parents=[common], help="pipeline the layers over the fewest chips, balancing the stages")
+    parser_partition.add_argument("--users", type=int, default=USERS, help=f"number of users (default {USERS})")
+    parser_partition.add_argument("--input-len", type=float, help="prefill input length (default half the model context length)")
+    parser_partition.add_argument("--chip-size", type=float, default=800, help="chip size in mm² (default 800, a reticle)")
+    add_hardware_arguments(parser_partition)
+    parser_partition.add_argument("--w-res", type=int, default=W_RES, help="weight resolution in bits")
+    parser_partition.add_argument("--act-res", type=int, default=ACT_RES, help="activation resolution in bits")
+    parser_partition.add_argument("--kv-res", type=int, help="KV$ resolution in bits (default the activation resolution)")
+    parser_partition.set_defaults(func=partition)
+
+    parser_precision = commands.add_parser("precision", parents=[common], help="storage area and chips of every weight / KV$ / activation precision combination")
+    parser_precision.add_argument("--users", type=int, nargs="+", default=[USERS], help=f"number of users (default {USERS})")
+    parser_precision.add_argument("--context-len", type=int, nargs="+", help="context lengths, sizing the KV$ too (default the model's own)")
+    parser_precision.add_argument("--input-len", type=float, help="prefill input length (default half the context length)")
+    parser_precision.add_argument("--chip-size", type=float, default=800, help="chip size in mm² (default 800, a reticle)")
+    add_hardware_arguments(parser_precision)
+    parser_precision.add_argument("--w-res", type=int, nargs="+", default=[W_RES], help="weight resolutions in bits")
+    parser_precision.add_argument("--act-res", type=int, nargs="+", default=[ACT_RES], help="activation resolutions in bits")
+    parser_precision.add_argument("--kv-res", type=int, nargs="+", help="KV$ resolutions in bits (default the activation resolutions)")
+    parser_precision.set_defaults(func=precision)
+
+    parser_sweep = commands.add_parser("sweep", parents=[common], help="sweep the models over every combination of the hardware values")
+    parser_sweep.add_argument("--out", default="data/sweep", help="output directory, resumed if it holds an earlier run of the same sweep (default data/sweep)")
+    parser_sweep.add_argument("--users", type=int, nargs="+", help="number of users axis (default 1, 9, ..., 249)")
+    parser_sweep.add_argument("--input-len", type=float, help="prefill input length (default half the model context length)")
+    add_hardware_arguments(parser_sweep, sweep=True)
+    parser_sweep.add_argument("--w-res", type=int, nargs="+", default=[W_RES], help="weight resolutions in bits")
+    parser_sweep.add_argument("--act-res", type=int, nargs="+", default=[ACT_RES], help="activation resolutions in bits")
+    parser_sweep.add_argument("--kv-res", type=int, nargs="+", help="KV$ resolutions in bits (default the activation resolutions)")
+    parser_sweep.add_argument("--chunk-size", type=int, default=1_000_000, help="grid points per chunk")
+    parser_sweep.add_argument("--workers", type=int, help="number of processes (default all cores)")
+    parser_sweep.add_argument("--format", choices=("npz", "csv"), default="npz")
+    parser_sweep.add_argument("--cache", action="store_true", help="serve the chunks from the on-disk result cache, computing only the cells it lacks")
+    parser_sweep.set_defaults(func=sweep)
+
+    parser_plot = commands.add_parser("plot", parents=[common], help="plot the number of chips required against model size and users")
+    parser_plot.add_argument("--users", type=int, nargs="+", help="number of users axis (default 1, 9, ..., 249)")
+    add_hardware_arguments(parser_plot)
+    parser_plot.add_argument("--w-res", type=int, nargs="+", default=[W_RES], help="weight resolutions in bits")
+    parser_plot.add_argument("--act-res", type=int, nargs="+", default=[ACT_RES], help="activation resolutions in bits")
+    parser_plot.add_argument("--kv-res", type=int, nargs="+", help="KV$ resolutions in bits (default the activation resolutions)")
+    parser_plot.add_argument("--output", default="data/chip_requirements.png", help="image file to write")
+    parser_plot.add_argument("--show", action="store_true", help="also open an interactive window")
+    parser_plot.add_argument("--pareto", action="store_true", help="overlay the Pareto frontier")
+    parser_plot.add_argument("--cache", action="store_true", help="reuse results from the on-disk result cache (pays off for expensive grids only)")
+    parser_plot.set_defaults(func=plot)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv or ["plot"])
+
+    from utils import profiling
+    if args.profile or args.profile_output or args.cprofile:
+        # before the model and calculation modules are imported, so their functions get instrumented
+        profiling.enable(args.profile_output, args.cprofile)
+
+    with profiling.stage("load"):
+        catalog, selection = load_models(args)
+    with profiling.stage(args.command):
+        args.func(args, catalog, selection)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+from array import array
+
+from models.model import FIELD_KEYS, MODEL_FIELDS, LLMModel
+from utils.profiling import instrument
+
+# Streaming ingestion of large model catalogs. A catalog is either the data/models.json schema ({"model_types": [
+# {"model_name": family, "models": [...]}, ...]}) or JSONL with one model per line (an optional "family" key names its
+# family) or one {"model_name": ..., "models": [...]} family per line. The JSON schema is walked incrementally: only the
+# structural characters between models are scanned in Python, every model object is decoded by json's C scanner, and no
+# document tree is ever built. Rows are grouped by family (in order of first appearance) into one int64 column block.
+#
+# load_catalog keeps a binary sidecar next to the source, <source>.catalog/<sha256 prefix>/: the raw column block
+# (memory-mapped on load), the names and a small JSON header. source.json records the source size and mtime with its
+# hash, so an unchanged source is not even re-hashed and later runs load the catalog in milliseconds. Everything here is
+# standard library only; catalog.table() converts to a NumPy ModelTable without copying the column block.
+
+CATALOG_VERSION = 1
+CHUNK_SIZE = 1 << 20
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+_DECODER = json.JSONDecoder()
+_NON_WHITESPACE = re.compile(r"\S")
+_KEYS = tuple(FIELD_KEYS.values())
+_DEFAULTS = (0,) * len(_KEYS)
+
+
+class ModelCatalog:
+    """
+    Read-only model catalog with O(1) lookup by name and by family.
+
+    Rows of the same family are contiguous. Model fields are kept in one flat int64 buffer, one column of len(catalog)
+    values per LLMModel field in MODEL_FIELDS order (an array, or a memoryview of the memory-mapped sidecar).
+    """
+    __slots__ = ("_data", "names", "_family_slices", "_names_index", "_family_index")
+
+    def __init__(self, data, names, family_slices):
+        self._data = data
+        self.names = names
+        self._family_slices = family_slices
+        self._names_index = None
+        self._family_index = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def __getitem__(self, row):
+        count = len(self.names)
+        if row < 0:
+            row += count
+        if not 0 <= row < count:
+            raise IndexError("catalog row out of range")
+        values = [self._data[column * count + row] for column in range(len(MODEL_FIELDS))]
+        return LLMModel(name=self.names[row], **dict(zip(_KEYS, values)))
+
+    def __contains__(self, key):
+        # a model name, or a (family, name) pair
+        try:
+            if isinstance(key, tuple):
+                self.index(key[1], key[0])
+            else:
+                self.index(key)
+        except KeyError:
+            return False
+        return True
+
+    def families(self):
+        return list(self._family_slices)
+
+    def family_rows(self, family):
+        start, stop = self._family_slices[family]
+        return range(start, stop)
+
+    def family(self, family):
+        return [self[row] for row in self.family_rows(family)]
+
+    def by_type(self):
+        # counterpart of parse_models_by_type
+        return {family: self.family(family) for family in self._family_slices}
+
+    def index(self, name, family=None):
+        # row of a model; a name used by several families resolves to its first row unless the family is given
+        if family is None:
+            if self._names_index is None:
+                # assigned last to first so that the first occurrence of a name wins
+                self._names_index = dict(zip(reversed(self.names), range(len(self.names) - 1, -1, -1)))
+            return self._names_index[name]
+        index = self._family_index.get(family)
+        if index is None:
+            rows = self.family_rows(family)
+            index = self._family_index[family] = dict(zip(reversed(self.names[rows.start:rows.stop]), reversed(rows)))
+        return index[name]
+
+    def model(self, name, family=None):
+        return self[self.index(name, family)]
+
+    def table(self):
+        # NumPy ModelTable over the same column block (no copy)
+        import numpy as np
+        from models.table import ModelTable
+
+        count = len(self.names)
+        data = np.frombuffer(self._data, dtype=np.int64).reshape(len(MODEL_FIELDS), count)
+        families = [""] * count
+        for family, (start, stop) in self._family_slices.items():
+            families[start:stop] = [family] * (stop - start)
+        return ModelTable(data, np.array(self.names, dtype=str), np.array(families, dtype=str), dict(self._family_slices))
+
+
+def iter_models(path, chunk_size=CHUNK_SIZE):
+    # (family, model dict) pairs in file order, read incrementally from a JSON or JSONL catalog
+    with open(path, "r") as f:
+        if path.endswith(JSONL_EXTENSIONS):
+            yield from _iter_jsonl(f)
+        else:
+            yield from _iter_json(_JSONStream(f, chunk_size))
+
+
+@instrument
+def build_catalog(path, chunk_size=CHUNK_SIZE):
+    # parse a catalog into a ModelCatalog without building the JSON document
+    groups = {}  # family -> (names, row-major int64 fields)
+    for family, model in iter_models(path, chunk_size):
+        group = groups.get(family)
+        if group is None:
+            group = groups[family] = ([], array("q"))
+        group[0].append(model.get("name", "llm_model"))
+        group[1].extend(map(model.get, _KEYS, _DEFAULTS))
+
+    # transpose to one column per field with strided slices of the row-major blocks
+    data, names, family_slices = array("q"), [], {}
+    for family, (family_names, _) in groups.items():
+        family_slices[family] = (len(names), len(names) + len(family_names))
+        names.extend(family_names)
+    for field in range(len(_KEYS)):
+        for _, rows in groups.values():
+            data.extend(rows[field::len(_KEYS)])
+    return ModelCatalog(data, names, family_slices)
+
+
+@instrument
+def load_catalog(path, cache=True, chunk_size=CHUNK_SIZE):
+    """
+    Loads a JSON or JSONL model catalog, from its binary sidecar when the source is unchanged.
+
+    Parameters:
+        path (str): Catalog file.
+        cache (bool): Read and write the <path>.catalog sidecar; a sidecar that cannot be written is skipped.
+        chunk_size (int): Characters read per step while streaming the source.
+
+    Returns:
+        ModelCatalog: The catalog.
+    """
+    if not cache:
+        return build_catalog(path, chunk_size)
+    directory = path + ".catalog"
+    stat = os.stat(path)
+    source = _read_json(os.path.join(directory, "source.json"))
+    unchanged = source is not None and source.get("size") == stat.st_size and source.get("mtime_ns") == stat.st_mtime_ns
+    digest = source["sha256"] if unchanged else file_hash(path)
+
+    entry = os.path.join(directory, digest[:16])
+    catalog = _read_sidecar(entry)
+    if catalog is None:
+        catalog = build_catalog(path, chunk_size)
+        try:
+            _write_sidecar(directory, entry, catalog)
+        except OSError:
+            return catalog
+    if not unchanged:
+        try:
+            _write_json(os.path.join(directory, "source.json"), {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest})
+        except OSError:
+            pass
+    return catalog
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _JSONStream:
+    # incremental reader over a text file: structural characters are scanned here, values are decoded by json
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # next non-whitespace character, "" at the end of the file
+        while True:
+            match = _NON_WHITESPACE.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"malformed model catalog: expected one of {chars!r}, found {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.scan_once(self.buf, self.pos)
+                # a value ending exactly at the end of the buffer may be a truncated number
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except (json.JSONDecodeError, StopIteration):
+                if self.eof:
+                    raise ValueError(f"malformed model catalog at character {self.pos} of the current block") from None
+            self.fill()
+
+
+def _keys(stream):
+    # keys of the object whose "{" was just consumed; the stream is left at each key's value
+    if stream.peek() == "}":
+        stream.pos += 1
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        yield key
+        if stream.expect(",}") == "}":
+            return
+
+
+def _items(stream):
+    # one step per element of the array whose "[" was just consumed; the stream is left at each element
+    if stream.peek() == "]":
+        stream.pos += 1
+        return
+    while True:
+        yield
+        if stream.expect(",]") == "]":
+            return
+
+
+def _iter_json(stream):
+    stream.expect("{")
+    for key in _keys(stream):
+        if key == "model_types":
+            stream.expect("[")
+            for _ in _items(stream):
+                yield from _iter_family(stream)
+        else:
+            stream.value()
+
+
+def _iter_family(stream):
+    stream.expect("{")
+    family, pending = None, []
+    for key in _keys(stream):
+        if key == "models":
+            stream.expect("[")
+            for _ in _items(stream):
+                model = stream.value()
+                if family is None:
+                    # "models" before "model_name": hold this family's models until its name is known
+                    pending.append(model)
+                else:
+                    yield family, model
+        elif key == "model_name":
+            family = stream.value()
+            yield from ((family, model) for model in pending)
+            pending = []
+        else:
+            stream.value()
+    yield from (("", model) for model in pending)
+
+
+def _iter_jsonl(f):
+    for line in f:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "models" in record:
+            family = record.get("model_name", "")
+            yield from ((family, model) for model in record["models"])
+        else:
+            yield record.get("family", ""), record
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_sidecar(entry):
+    meta = _read_json(os.path.join(entry, "meta.json"))
+    if meta is None or meta.get("version") != CATALOG_VERSION or meta.get("byteorder") != sys.byteorder or meta.get("fields") != list(MODEL_FIELDS):
+        return None
+    names = _read_json(os.path.join(entry, "names.json"))
+    if names is None or len(names) != meta["count"]:
+        return None
+    data = array("q")
+    if names:
+        with open(os.path.join(entry, "data.bin"), "rb") as f:
+            # the memoryview keeps the mapping alive after the file is closed
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("q")
+        if len(data) != len(names) * len(MODEL_FIELDS):
+            return None
+    return ModelCatalog(data, names, {family: (start, stop) for family, start, stop in meta["families"]})
+
+
+def _write_sidecar(directory, entry, catalog):
+    # write a complete entry under a temporary name, then rename it into place and drop entries of older sources
+    os.makedirs(directory, exist_ok=True)
+    tmp_entry = f"{entry}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    os.makedirs(tmp_entry)
+    with open(os.path.join(tmp_entry, "data.bin"), "wb") as f:
+        f.write(catalog._data)
+    with open(os.path.join(tmp_entry, "names.json"), "w") as f:
+        json.dump(catalog.names, f)
+    meta = {"version": CATALOG_VERSION, "byteorder": sys.byteorder, "fields": list(MODEL_FIELDS), "count": len(catalog),
+            "families": [[family, start, stop] for family, (start, stop) in catalog._family_slices.items()]}
+    with open(os.path.join(tmp_entry, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp_entry, entry)
+    for stale in os.scandir(directory):
+        if stale.is_dir() and stale.path != entry and not stale.name.endswith(".tmp"):
+            shutil.rmtree(stale.path, ignore_errors=True)
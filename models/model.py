@@ -1,6 +1,30 @@
 import json
+from collections import namedtuple
+
+from utils.profiling import instrument
+
+# LLMModel attribute -> key used in data/models.json
+FIELD_KEYS = {
+    "vocab_size": "vocab_size",
+    "layers": "layers",
+    "emb_dim": "emb_dim",
+    "num_attention_heads": "num_attention_heads",
+    "num_kv_heads": "num_kv_heads",
+    "head_dim": "head_dim",
+    "ffn_dim": "ffn_dim",
+    "ffn_layers": "ffn_layers",
+    "context_len": "context_size",
+    "max_context_len": "max_context_size",
+}
+MODEL_FIELDS = tuple(FIELD_KEYS)
+
+# immutable, hashable snapshot of a model's architecture fields (used as a cache key)
+ModelSpec = namedtuple("ModelSpec", MODEL_FIELDS)
 
 class LLMModel:
+    __slots__ = ("name",) + MODEL_FIELDS
+
+    @instrument
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', 'llm_model')
         self.vocab_size = kwargs.get('vocab_size', 0)
@@ -27,11 +51,13 @@ class LLMModel:
         print(f"  Context Length: {self.context_len}")
         print(f"  Max Context Length: {self.max_context_len}")
 
+@instrument
 def load_llm_model(model_path):
     with open(model_path, 'r') as f:
         model_config = json.load(f)
     return model_config
 
+@instrument
 def parse_models_by_type(json_data):
     set_of_models = {}
     for model_types in json_data["model_types"]:
@@ -0,0 +1,140 @@
+import hashlib
+
+import numpy as np
+
+from models.model import FIELD_KEYS, MODEL_FIELDS, LLMModel, load_llm_model
+from utils.profiling import instrument
+
+
+class ModelTable:
+    """
+    Struct-of-arrays model catalog: one int64 column per LLMModel field, with rows of the same model family
+    (the "model_name" of a data/models.json entry) stored contiguously so each family is a zero-copy slice.
+
+    Columns are exposed under the LLMModel attribute names (table.layers, table.emb_dim, ...), so a table can be
+    passed straight to the functions in utils/vectorized.py in place of a single model.
+    """
+    __slots__ = ("_data", "name", "family", "_family_slices")
+
+    def __init__(self, data, names, families, family_slices=None):
+        # data: (len(MODEL_FIELDS), M) int64 block (or a broadcast view of it); names/families: (M,) str arrays
+        self._data = data
+        self.name = names
+        self.family = families
+        self._family_slices = family_slices
+
+    @property
+    def _families(self):
+        # family -> (start, stop) row range, built on first use
+        if self._family_slices is None:
+            self._family_slices = _family_slices(self.family)
+        return self._family_slices
+
+    @classmethod
+    @instrument
+    def from_json(cls, json_data):
+        names, families, rows = [], [], []
+        for model_type in json_data["model_types"]:
+            for model in model_type["models"]:
+                names.append(model.get("name", "llm_model"))
+                families.append(model_type["model_name"])
+                rows.append([model.get(key, 0) for key in FIELD_KEYS.values()])
+        return cls._from_rows(rows, names, families)
+
+    @classmethod
+    def from_models(cls, models, family=""):
+        rows = [[getattr(model, field) for field in MODEL_FIELDS] for model in models]
+        return cls._from_rows(rows, [model.name for model in models], [family] * len(rows))
+
+    @classmethod
+    def _from_rows(cls, rows, names, families):
+        data = np.array(rows, dtype=np.int64).reshape(len(rows), len(MODEL_FIELDS)).T.copy()
+        names = np.array(names, dtype=str)
+        families = np.array(families, dtype=str)
+        # group rows by family while keeping the catalog order of first appearance
+        _, first, inverse = np.unique(families, return_index=True, return_inverse=True)
+        rank = np.empty_like(first)
+        rank[np.argsort(first)] = np.arange(len(first))
+        order = np.argsort(rank[inverse.ravel()], kind="stable")
+        return cls(np.ascontiguousarray(data[:, order]), names[order], families[order])
+
+    def __getattr__(self, field):
+        if field.startswith("_"):
+            raise AttributeError(field)
+        try:
+            return self._data[MODEL_FIELDS.index(field)]
+        except ValueError:
+            raise AttributeError(field) from None
+
+    def __len__(self):
+        return len(self.name)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._view(index)
+        row = self._data[(slice(None), index) + (0,) * (self._data.ndim - 2)]
+        return LLMModel(name=str(self.name[index]), **dict(zip(FIELD_KEYS.values(), row.tolist())))
+
+    def _view(self, rows):
+        data = self._data[(slice(None), rows) + (slice(None),) * (self._data.ndim - 2)]
+        return ModelTable(data, self.name[rows], self.family[rows])
+
+    def filter(self, mask):
+        # rows selected by a boolean mask or index array (kept in catalog order); a contiguous selection is returned
+        # as a view, anything else costs one gather of the int64 block
+        mask = np.asarray(mask)
+        rows = np.flatnonzero(mask) if mask.dtype == bool else np.unique(mask.astype(np.intp))
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows) and np.all(np.diff(rows) == 1):
+            return self._view(slice(rows[0], rows[-1] + 1))
+        return self._view(rows)
+
+    def take(self, rows):
+        # gather rows in the given order (repeats allowed), e.g. to expand a flat sweep index into model columns
+        return self._view(np.asarray(rows, dtype=np.intp))
+
+    def families(self):
+        return list(self._families)
+
+    def by_family(self, family):
+        start, stop = self._families[family]
+        return self._view(slice(start, stop))
+
+    def by_type(self):
+        # columnar counterpart of parse_models_by_type
+        return {family: self.by_family(family) for family in self._families}
+
+    def digest(self):
+        # SHA-256 of the model columns (names and families excluded): identifies the model specs of the table, in order
+        return hashlib.sha256(np.ascontiguousarray(self._data).tobytes()).hexdigest()
+
+    def row_digests(self):
+        # SHA-256 of each row's columns: identifies one model spec wherever it sits in a table
+        rows = np.ascontiguousarray(self._data.reshape(self._data.shape[0], -1).T)
+        return [hashlib.sha256(row.tobytes()).hexdigest() for row in rows]
+
+    def broadcast(self, ndim=1):
+        # view with (M, 1, ..., 1) columns so the model axis broadcasts against ndim trailing sweep axes
+        data = self._data.reshape(self._data.shape[:2] + (1,) * ndim)
+        return ModelTable(data, self.name, self.family, self._families)
+
+    def display(self):
+        for model in self:
+            model.display()
+
+
+def _family_slices(families):
+    slices = {}
+    if len(families) == 0:
+        return slices
+    starts = np.flatnonzero(np.r_[True, families[1:] != families[:-1]])
+    stops = np.r_[starts[1:], len(families)]
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        slices[str(families[start])] = (start, stop)
+    return slices
+
+
+def load_model_table(model_path):
+    return ModelTable.from_json(load_llm_model(model_path))
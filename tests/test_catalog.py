@@ -0,0 +1,88 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from models.catalog import build_catalog, iter_models, load_catalog
+from models.model import MODEL_FIELDS, load_llm_model
+from models.table import load_model_table
+
+SOURCE = "data/models.json"
+TABLE = load_model_table(SOURCE)
+
+
+def assert_matches_table(catalog, expected=TABLE):
+    table = catalog.table()
+    assert table.name.tolist() == expected.name.tolist()
+    assert table.family.tolist() == expected.family.tolist()
+    for field in MODEL_FIELDS:
+        np.testing.assert_array_equal(getattr(table, field), getattr(expected, field))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_chunk_boundaries(chunk_size):
+    # every chunk size splits keys, numbers and structural characters at different places
+    assert_matches_table(build_catalog(SOURCE, chunk_size))
+    assert [model for _, model in iter_models(SOURCE, chunk_size)] == [
+        model for family in load_llm_model(SOURCE)["model_types"] for model in family["models"]]
+
+
+def test_number_split_at_chunk_end(tmp_path):
+    # a number cut by the end of a chunk must not be decoded as its prefix
+    path = tmp_path / "models.json"
+    path.write_text('{"model_types": [{"model_name": "f", "models": [{"name": "m", "layers": 123456789}]}]}')
+    for chunk_size in range(1, 20):
+        assert build_catalog(str(path), chunk_size)[0].layers == 123456789
+
+
+def test_jsonl(tmp_path):
+    families = load_llm_model(SOURCE)["model_types"]
+    per_model, per_family = tmp_path / "models.jsonl", tmp_path / "families.jsonl"
+    per_model.write_text("".join(json.dumps({"family": family["model_name"], **model}) + "\n\n"
+                                 for family in families for model in family["models"]))
+    per_family.write_text("".join(json.dumps(family) + "\n" for family in families))
+    assert_matches_table(build_catalog(str(per_model)))
+    assert_matches_table(build_catalog(str(per_family)))
+
+
+def test_models_before_model_name(tmp_path):
+    families = load_llm_model(SOURCE)["model_types"]
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps({"model_types": [{"models": family["models"], "extra": [1, {"a": 2}],
+                                                 "model_name": family["model_name"]} for family in families]}))
+    assert_matches_table(build_catalog(str(path), chunk_size=16))
+
+    # a family without a name keeps its models under ""
+    path.write_text(json.dumps({"model_types": [{"models": families[0]["models"]}]}))
+    catalog = build_catalog(str(path))
+    assert catalog.families() == [""] and len(catalog) == len(families[0]["models"])
+
+
+def test_sidecar_invalidation(tmp_path):
+    path = tmp_path / "models.json"
+    path.write_text(open(SOURCE).read())
+    assert_matches_table(load_catalog(str(path)))
+    # an unchanged source is served from the memory-mapped sidecar
+    cached = load_catalog(str(path))
+    assert isinstance(cached._data, memoryview)
+    assert_matches_table(cached)
+
+    # an edit of the same size with the old modification time is not noticed without re-hashing, so bump it
+    text = path.read_text()
+    stat = os.stat(path)
+    path.write_text(text.replace('"layers": 32', '"layers": 33', 1))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    edited = load_catalog(str(path))
+    assert edited[0].layers == 33
+    assert load_catalog(str(path))[0].layers == 33
+    assert len(os.listdir(tmp_path / "models.json.catalog")) == 2  # source.json and the one current entry
+
+
+def test_negative_rows():
+    catalog = build_catalog(SOURCE)
+    assert catalog[-1].max_context_len == TABLE[len(TABLE) - 1].max_context_len
+    assert catalog[-len(catalog)].name == catalog[0].name
+    for row in (len(catalog), -len(catalog) - 1):
+        with pytest.raises(IndexError):
+            catalog[row]
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils.pareto import chip_requirement_front, pareto_front, pareto_indices
+
+
+def brute_force_front(costs):
+    # a row is kept unless another row is <= in every column and < in at least one
+    costs = np.asarray(costs, dtype=np.float64)
+    less_equal = np.all(costs[:, None, :] <= costs[None, :, :], axis=2)
+    less = np.any(costs[:, None, :] < costs[None, :, :], axis=2)
+    return ~np.any(less_equal & less, axis=0)
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4, 5])
+@pytest.mark.parametrize("levels", [3, 20, None])
+def test_matches_brute_force(k, levels):
+    # few levels give many ties and duplicate rows, None continuous values
+    rng = np.random.default_rng(1000 * k + (levels or 0))
+    for n in (0, 1, 2, 7, 150, 1500):
+        costs = rng.random((n, k)) if levels is None else rng.integers(0, levels, (n, k)).astype(np.float64)
+        np.testing.assert_array_equal(pareto_front(costs), brute_force_front(costs))
+
+
+def test_many_groups_matches_brute_force():
+    # continuous key columns: every row is its own group
+    rng = np.random.default_rng(7)
+    costs = np.column_stack([rng.integers(0, 50, 3000), rng.random(3000), rng.random(3000), rng.integers(0, 8, 3000)])
+    np.testing.assert_array_equal(pareto_front(costs), brute_force_front(costs))
+
+
+@pytest.mark.parametrize("k", [3, 4, 5])
+def test_pruned_continuous_matches_brute_force(k):
+    # continuous keys form one group per row, so the rows are pruned against the pivot skyline first; the duplicated
+    # rows include the pivots themselves
+    rng = np.random.default_rng(k)
+    costs = rng.random((2500, k))
+    costs = np.concatenate([costs, costs[:500]])
+    np.testing.assert_array_equal(pareto_front(costs), brute_force_front(costs))
+
+
+def test_column_order_does_not_matter():
+    rng = np.random.default_rng(9)
+    costs = np.column_stack([rng.integers(0, 6, 3000), rng.integers(0, 40, 3000), rng.random(3000), rng.integers(0, 3, 3000)])
+    expected = brute_force_front(costs)
+    for order in ([0, 1, 2, 3], [2, 3, 0, 1], [3, 2, 1, 0], [1, 3, 2, 0]):
+        np.testing.assert_array_equal(pareto_front(costs[:, order]), expected)
+
+
+def best_time(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.parametrize("layout", ["continuous", "mixed"])
+def test_scales_like_a_sort(layout):
+    # a continuous column among the keys used to fall back to one group per row (hundreds of sorts' worth of time);
+    # the front now costs a few tens of sorts of one column
+    rng = np.random.default_rng(4)
+    n = 200_000
+    if layout == "continuous":
+        costs = rng.random((n, 3))
+    else:
+        costs = np.column_stack([rng.integers(0, 50, n), rng.integers(0, 30, n), rng.random(n), rng.integers(0, 8, n)])
+    costs = costs.astype(np.float64)
+    sort_time = best_time(lambda: np.argsort(costs[:, 2]))
+    assert best_time(lambda: pareto_front(costs)) < 100 * sort_time
+
+
+def test_anticorrelated_front():
+    # points on a simplex plane are all Pareto-optimal
+    rng = np.random.default_rng(3)
+    costs = rng.random((2000, 4))
+    costs /= costs.sum(axis=1, keepdims=True)
+    assert pareto_front(costs).all()
+
+
+def test_column_list_input():
+    rng = np.random.default_rng(5)
+    columns = [rng.integers(0, 10, 400) for _ in range(3)]
+    np.testing.assert_array_equal(pareto_indices(columns), np.flatnonzero(brute_force_front(np.column_stack(columns))))
+
+
+def test_chip_requirement_front_maximizes_users():
+    rng = np.random.default_rng(11)
+    results = {"num_reticle_chips": rng.integers(1, 6, (5, 32)), "total_area": rng.random((5, 32)) * 1e4,
+               "users": np.broadcast_to(np.arange(1, 257, 8), (5, 32))}
+    costs = np.column_stack([np.ravel(results["num_reticle_chips"]), np.ravel(results["total_area"]), -np.ravel(results["users"])])
+    np.testing.assert_array_equal(chip_requirement_front(results), np.flatnonzero(brute_force_front(costs)))
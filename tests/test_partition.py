@@ -0,0 +1,60 @@
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+from models.table import load_model_table
+from utils.partition import layer_assignment, partition_layers, stage_area
+
+TABLE = load_model_table("data/models.json")
+HARDWARE = (0.02, 64, 0.034, 0.034, 1.352, 8, 8)
+
+
+def brute_force(model, users, chip_size):
+    # DP over every contiguous split: (fewest chips, smallest largest stage area) for layers i.. plus the FLL
+    n = np.arange(model.layers + 1)
+    areas = {head: stage_area(model, n, head, users, model.context_len * 0.5, *HARDWARE)[0].tolist() for head in (False, True)}
+
+    def area(layers, head):
+        return areas[head][layers]
+
+    @lru_cache(maxsize=None)
+    def best(i):
+        out = (np.inf, np.inf)
+        head = area(model.layers - i, True)
+        if head <= chip_size:
+            out = (1, head)
+        for j in range(i + 1, model.layers):
+            body = area(j - i, False)
+            if body > chip_size:
+                break
+            chips, bottleneck = best(j)
+            out = min(out, (chips + 1, max(body, bottleneck)))
+        return out
+
+    return best(0)
+
+
+@pytest.mark.parametrize("users", [1, 9, 200])
+@pytest.mark.parametrize("chip_size", [800, 3000, 20000])
+def test_matches_brute_force(users, chip_size):
+    for model in TABLE:
+        result = partition_layers(model, users, model.context_len * 0.5, *HARDWARE, chip_size=chip_size)
+        chips, bottleneck = brute_force(model, users, chip_size)
+        assert result.num_chips == chips, model.name
+        if np.isfinite(chips):
+            assert result.bottleneck_area == bottleneck, model.name
+            ranges = layer_assignment(model.layers, result.num_chips, result.head_layers)
+            assert len(ranges) == chips and ranges[0][0] == 0 and ranges[-1][1] == model.layers
+            assert all(stop - start <= result.body_layers for start, stop in ranges[:-1])
+
+
+def test_broadcast_matches_points():
+    # one call over models x users gives the per-point answers
+    users = np.array([1, 9, 64, 200])
+    table = TABLE.broadcast(1)
+    result = partition_layers(table, users[None, :], table.context_len * 0.5, *HARDWARE, chip_size=3000)
+    for m, model in enumerate(TABLE):
+        for u, value in enumerate(users):
+            point = partition_layers(model, value, model.context_len * 0.5, *HARDWARE, chip_size=3000)
+            assert (result.num_chips[m, u], result.bottleneck_area[m, u]) == (point.num_chips, point.bottleneck_area)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from models.table import load_model_table
+from utils.dse import RESULT_FIELDS, load_sweep, run_sweep
+from utils.result_cache import ResultCache, cached_sweep
+
+TABLE = load_model_table("data/models.json")
+AXES = {"weight_density": [0.01, 0.02], "weight_tiers": [64], "kv_density": [0.034], "act_density": [0.034],
+        "tmacs_per_mm2": [1.352], "w_res": [4, 8], "act_res": [8], "kv_res": [8, 16]}
+USERS = np.arange(1, 257, 8)
+CELLS = len(TABLE) * 8
+
+
+def assert_grids_equal(grid, expected):
+    for field in RESULT_FIELDS:
+        np.testing.assert_array_equal(grid[field], expected[field])
+
+
+def test_misses_only_new_cells_and_users(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    reference = cached_sweep(ResultCache(str(tmp_path / "reference")), TABLE, AXES, np.append(USERS, 300))
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    assert_grids_equal(cached_sweep(cache, TABLE[:-1], AXES, USERS), {f: reference[f][:-1, :-1] for f in RESULT_FIELDS})
+    assert (cache.hits, cache.misses) == (0, CELLS - 8)
+
+    # a new model misses only its own cells, a dropped model none
+    assert_grids_equal(cached_sweep(cache, TABLE, AXES, USERS), {f: reference[f][:, :-1] for f in RESULT_FIELDS})
+    assert (cache.hits, cache.misses) == (CELLS - 8, CELLS)
+    assert_grids_equal(cached_sweep(cache, TABLE[1:], AXES, USERS), {f: reference[f][1:, :-1] for f in RESULT_FIELDS})
+    assert cache.misses == CELLS
+
+    # a new users value is merged into every cell; the cached users are then all hits, in any order
+    assert_grids_equal(cached_sweep(cache, TABLE, AXES, np.append(USERS, 300)), reference)
+    assert cache.misses == 2 * CELLS
+    hits = cache.hits
+    assert_grids_equal(cached_sweep(cache, TABLE, AXES, [300, 1, 17]), {f: reference[f][:, [-1, 0, 2]] for f in RESULT_FIELDS})
+    assert (cache.hits, cache.misses) == (hits + CELLS, 2 * CELLS)
+
+
+def test_cells_are_memory_mapped(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cached_sweep(cache, TABLE[:1], AXES, USERS)
+    key = cache.key(TABLE.row_digests()[0], {name: values[0] for name, values in AXES.items()})
+    block = cache.get(key, USERS)
+    assert block.shape == (len(RESULT_FIELDS), len(USERS)) and not block.flags.owndata and not block.flags.writeable
+
+
+def test_run_sweep_from_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    run_sweep(TABLE, AXES, str(tmp_path / "direct"), USERS, chunk_size=700, workers=2)
+    run_sweep(TABLE, AXES, str(tmp_path / "cached"), USERS, chunk_size=700, workers=2, cache=cache)
+    for direct, cached in zip(load_sweep(str(tmp_path / "direct")), load_sweep(str(tmp_path / "cached")), strict=True):
+        for field in RESULT_FIELDS:
+            np.testing.assert_array_equal(direct[field], cached[field])
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from models.model import load_llm_model, parse_models_by_type
+from utils import calculations
+from utils.roofline import BOUNDS, calculate_latency, compute_area_for_throughput, peak_gflops
+
+MODELS = [model for models in parse_models_by_type(load_llm_model("data/models.json")).values() for model in models]
+USERS = np.array([1, 8, 64, 256])
+
+
+@pytest.mark.parametrize("w_res", [4, 8])
+def test_weight_bound_token_reads_each_weight_once(w_res):
+    # unlimited compute and StRAM: a token costs one read of every weight, the FLL included, whatever the users
+    for model in MODELS:
+        result = calculate_latency(model, model.context_len * 0.5, USERS, 1e4, np.inf, 1.352, np.inf, w_res=w_res)
+        expected = 1e4 / (calculations.calculate_total_params(model)[0] * (w_res / 8))
+        np.testing.assert_allclose(result["tokens_per_s"], expected, rtol=1e-12)
+        np.testing.assert_allclose(result["tokens_per_s_per_user"], expected / USERS, rtol=1e-12)
+        assert np.all(result["AR_bound"] == BOUNDS.index("ltram"))
+
+
+def test_compute_bound_token_runs_every_layer_and_the_fll_once():
+    for model in MODELS:
+        input_len = model.context_len * 0.5
+        result = calculate_latency(model, input_len, USERS, np.inf, np.inf, 1.352, 100.0)
+        layer_flops = calculations.calculate_total_flops(model, input_len, 1)[2][1] - 2 * model.emb_dim * model.vocab_size / 1000**3
+        flops = model.layers * layer_flops + 2 * model.emb_dim * model.vocab_size / 1000**3
+        np.testing.assert_allclose(result["AR_time"], flops / peak_gflops(1.352, 100.0), rtol=1e-12)
+        # the prompt of the first token passes every layer once too
+        prefill_flops = calculations.calculate_total_flops(model, input_len, model.layers)[1][1]
+        np.testing.assert_allclose(result["ttft"], prefill_flops / peak_gflops(1.352, 100.0), rtol=1e-12)
+
+
+def test_compute_area_for_throughput_inverts_latency():
+    for model in MODELS:
+        input_len = model.context_len * 0.5
+        result = calculate_latency(model, input_len, USERS, np.inf, np.inf, 1.352, 250.0)
+        area = compute_area_for_throughput(model, input_len, USERS, result["tokens_per_s_per_user"], np.inf, np.inf, 1.352)
+        np.testing.assert_allclose(area, 250.0, rtol=1e-12)
+        # the weight reads alone cap the rate
+        ceiling = 1e4 / calculations.calculate_total_params(model)[0]
+        assert np.isinf(compute_area_for_throughput(model, input_len, 1, ceiling * 1.01, 1e4, np.inf, 1.352))
+        assert np.isfinite(compute_area_for_throughput(model, input_len, 1, ceiling * 0.99, 1e4, np.inf, 1.352))
@@ -0,0 +1,58 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from models.model import MODEL_FIELDS, load_llm_model, parse_models_by_type
+from utils.solver import solve_max
+from utils.vectorized import calculate_chip_area
+
+MODELS = [model for models in parse_models_by_type(load_llm_model("data/models.json")).values() for model in models]
+HARDWARE = {"weight_density": 0.02, "weight_tiers": 64, "kv_density": 0.034, "act_density": 0.034, "tmacs_per_mm2": 1.352,
+            "w_res": 8, "act_res": 8, "kv_res": 8}
+GRID = np.arange(1, 20001, dtype=np.float64)
+
+
+def grid_area(model, variable, users=1):
+    # total chip area at every GRID value of the variable, the other variables as solve_max defaults them
+    if variable == "users":
+        return calculate_chip_area(model, GRID, model.context_len * 0.5, *HARDWARE.values())[0]
+    if variable == "input_len":
+        return calculate_chip_area(model, users, GRID, *HARDWARE.values())[0]
+    sized = SimpleNamespace(**{field: getattr(model, field) for field in MODEL_FIELDS})
+    sized.context_len = sized.max_context_len = GRID
+    return calculate_chip_area(sized, users, GRID * 0.5, *HARDWARE.values(), context_len=GRID)[0]
+
+
+@pytest.mark.parametrize("variable", ["users", "input_len", "context_len"])
+def test_matches_dense_grid(variable):
+    # budgets on and between grid areas below the last one: the answer is the last grid point that fits
+    rng = np.random.default_rng(0)
+    checked = 0
+    for model in MODELS:
+        areas = grid_area(model, variable)
+        # where the weight area dominates, the total stays flat and any budget above it fits the whole grid
+        inside = np.flatnonzero((areas > areas[0]) & (areas < areas[-1]))
+        for k in rng.choice(inside, min(4, len(inside)), replace=False):
+            for budget in (areas[k], (areas[k] + areas[k + 1]) / 2):
+                expected = GRID[np.flatnonzero(areas <= budget)[-1]]
+                result = solve_max(model, variable, HARDWARE, area=budget)
+                assert result.value == expected, (model.name, variable, budget)
+                assert result.binding == "sram_compute" and result.total_area <= budget
+                checked += 1
+    assert checked
+
+
+def test_binding_weight():
+    model = MODELS[0]
+    weight_area = calculate_chip_area(model, 1, model.context_len * 0.5, *HARDWARE.values())[1]
+    result = solve_max(model, "users", HARDWARE, area=weight_area * 0.5)
+    assert (result.value, result.binding) == (0, "weight")
+
+
+def test_unbounded():
+    # with a free KV$ the area stops growing once users exceed the layer count, so a large budget fits any number
+    model = MODELS[0]
+    result = solve_max(model, "users", dict(HARDWARE, kv_density=math.inf), area=1e12)
+    assert result.value == math.inf and result.binding is None
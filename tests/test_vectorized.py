@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from models.model import load_llm_model, parse_models_by_type
+from utils import calculations, vectorized
+
+MODELS = [model for models in parse_models_by_type(load_llm_model("data/models.json")).values() for model in models]
+USERS = np.array([1, 2, 7, 64, 256, 4096])
+HARDWARE = {"weight_density": 0.02, "weight_tiers": 64, "kv_density": 0.034, "act_density": 0.05, "tmacs_per_mm2": 1.352}
+
+# function name -> argument names, in the signature order of utils/calculations.py
+CALC_FUNCTIONS = {
+    "calculate_total_params": (),
+    "calculate_total_KV_cache_size": ("users",),
+    "calculate_activations": ("input_len", "users"),
+    "calculate_total_flops": ("input_len", "users"),
+    "calculate_total_mem_transfer": ("input_len", "users"),
+}
+
+
+def flatten(value):
+    if isinstance(value, (list, tuple)):
+        return [item for entry in value for item in flatten(entry)]
+    return [value]
+
+
+def scalar_chip_area(model, users, input_len, w_res, act_res, kv_res):
+    # the per-point area model of plot_model_chip_requirements before it was vectorized
+    weight_storage, act_storage, kv_storage = calculations.calculate_storage(model, w_res, act_res, input_len, users, kv_res)
+    weight_area = weight_storage * (1 / HARDWARE["weight_density"]) / HARDWARE["weight_tiers"]
+    sram_area = kv_storage * (1 / HARDWARE["kv_density"]) + act_storage * (1 / HARDWARE["act_density"])
+    compute_area = 2 * calculations.calculate_total_flops(model, input_len, users)[0] / 1000 / HARDWARE["tmacs_per_mm2"]
+    return max(sram_area + compute_area, weight_area), weight_area, sram_area, compute_area
+
+
+@pytest.mark.parametrize("input_len", ["half_context", 1.0, 2.0**20])
+@pytest.mark.parametrize("name", list(CALC_FUNCTIONS))
+def test_matches_scalar(name, input_len):
+    # every output of every cost function, exactly; 2**20 tokens pushes input_len² x users past int64
+    table = vectorized.stack_models(MODELS)
+    lengths = table.context_len * 0.5 if input_len == "half_context" else input_len
+    args = {"users": USERS[None, :], "input_len": lengths}
+    fast = flatten(getattr(vectorized, name)(table, *(args[arg] for arg in CALC_FUNCTIONS[name])))
+    for m, model in enumerate(MODELS):
+        for u, users in enumerate(USERS):
+            scalar_args = {"users": int(users), "input_len": model.context_len * 0.5 if input_len == "half_context" else input_len}
+            expected = flatten(getattr(calculations, name)(model, *(scalar_args[arg] for arg in CALC_FUNCTIONS[name])))
+            actual = [np.broadcast_to(value, (len(MODELS), len(USERS)))[m, u] for value in fast]
+            assert actual == expected, (model.name, int(users))
+
+
+@pytest.mark.parametrize("input_len", [4096.0, 2.0**20])
+def test_storage_matches_scalar(input_len):
+    table = vectorized.stack_models(MODELS)
+    for w_res, act_res, kv_res in [(8, 8, None), (4, 16, 2)]:
+        fast = vectorized.calculate_storage(table, w_res, act_res, input_len, USERS[None, :], kv_res)
+        for m, model in enumerate(MODELS):
+            for u, users in enumerate(USERS):
+                expected = calculations.calculate_storage(model, w_res, act_res, input_len, int(users), kv_res)
+                assert tuple(np.broadcast_to(value, (len(MODELS), len(USERS)))[m, u] for value in fast) == expected
+
+
+def test_chip_area_matches_scalar():
+    table = vectorized.stack_models(MODELS)
+    input_len = table.context_len * 0.5
+    fast = vectorized.calculate_chip_area(table, USERS[None, :], input_len, *HARDWARE.values(), 4, 8, 16)
+    for m, model in enumerate(MODELS):
+        for u, users in enumerate(USERS):
+            expected = scalar_chip_area(model, int(users), model.context_len * 0.5, 4, 8, 16)
+            np.testing.assert_allclose([np.broadcast_to(value, (len(MODELS), len(USERS)))[m, u] for value in fast], expected, rtol=1e-12)
+
@@ -1,4 +1,51 @@
-def calculate_total_params(model):
+from collections import namedtuple
+from functools import lru_cache
+from operator import attrgetter
+
+from models.model import MODEL_FIELDS, ModelSpec
+from utils.profiling import instrument
+
+# Quantities that depend only on the model architecture (weight totals, the per-layer KV$ size, every AR term and the
+# per-token / per-token-pair coefficients of the prefill terms) are computed once per ModelSpec and shared by every
+# calculate_* entry point through a bounded LRU cache; a call then only scales them by the input length and users.
+# compute_invariants also accepts ModelTable columns, which is how utils/compiled.py builds its coefficient tables.
+MODEL_CACHE_SIZE = 4096
+
+ModelInvariants = namedtuple("ModelInvariants", [
+    "params",                                                       # calculate_total_params result
+    "weights_layer", "weights_fll",                                 # weights of one layer and of the FLL
+    "kv_cache_user",                                                # per layer K/V cache of one user
+    # per layer activations: per prefill token, per prefill (query, key) pair, per AR token; FLL activations per token
+    "act_token", "act_pair", "act_AR", "fll_act",
+    # per layer FLOPs: weight operations (Q, K/V, O, FFN) and K/V projections per token, QK^T + QK^TV per prefill
+    # (query, key) pair and per AR token; FLL FLOPs per token
+    "flops_weights", "flops_kv", "flops_attention_pair", "flops_attention_AR", "fll_flops",
+    # memory transfers: all weights once; per layer act. mem per prefill token, per prefill (query, key) pair and per
+    # AR token; per layer KV$ writes per token and KV$ reads per AR token; FLL act. mem per token
+    "weight_mem_transfer", "act_mem_transfer_token", "act_mem_transfer_pair", "act_mem_transfer_AR",
+    "kv_cache_mem_transfer", "kv_cache_read_AR", "fll_act_mem_transfer",
+])
+
+_spec_fields = attrgetter(*MODEL_FIELDS)
+
+def model_invariants(model):
+    # the cache is keyed on the plain field tuple, which hashes and compares equal to the matching ModelSpec
+    return _model_invariants(model if isinstance(model, tuple) else _spec_fields(model))
+
+def model_cache_info():
+    # hits / misses / maxsize / currsize of the shared model cache
+    return _model_invariants.cache_info()
+
+def clear_model_cache():
+    _model_invariants.cache_clear()
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _model_invariants(fields):
+    return compute_invariants(ModelSpec(*fields))
+
+def compute_invariants(model):
+    # uncached; every field may be a scalar or a NumPy array of models
+
     # calculate total number of parameters (weights) in the model 
     
     # per layer Wo / Wq
@@ -23,196 +70,196 @@ def calculate_total_params(model):
 
     per_layer_weights = [w_ll, w_o, w_q, w_k, w_v, w_ffn]
 
+    # total weights in GB, total weights per layer in GB, and per layer weights in GB
+    params = (total_weights/1000**3, w_tot_layer/1000**3, tuple(value/1000**3 for value in per_layer_weights))
+
+    # per layer K/V cache of one user
+    kv_cache_user = 2 * model.num_kv_heads * model.head_dim * model.max_context_len
+
+    # activations, for one token (AR; prefill is I tokens)
+    # per input/output activations; in is the input prompt/token, out is the output prompt/token
+    in_out_act = 2 * 1 * model.emb_dim
+    # per layer query activations; Query (Q) = XWq
+    query_act = 1 * model.num_attention_heads * model.head_dim
+    # per layer attention matrix activations; qkT = QK^T, I x I per head for prefill. We exclude the softmax operation for activation calculation
+    qkT_act_AR = 1 * model.context_len * model.num_attention_heads
+    # qkTV = (QK^T)V.
+    qkTV_act = 1 * model.head_dim * model.num_attention_heads
+    # O = Concat(qkTV)Wo. Concatenate the qkTVs from each attention head and multiply by Wo
+    o_act = 1 * model.emb_dim
+    # FFN activations; FFN = (Swish(OW1) + OW2)W3 for LLama Models
+    ffn_act = (model.ffn_layers - 1) * 1 * model.ffn_dim + model.emb_dim
+    # FLL activations
+    fll_act = 1 * model.vocab_size
+
+    # FLOPs, for one token (AR; prefill is I tokens)
+    # Q = XWq; for AR, x = 1 x emb_dim; for prefill, x = I x emb_dim; Wq: emb_dim x num_attention_heads x head_dim;
+    q_flops = 2 * model.emb_dim * model.num_attention_heads * model.head_dim
+    # K/V = XWk/XWv; for AR, x = 1 x emb_dim; for prefill, x = I x emb_dim; Wk/Wv: emb_dim x head_dim x num_kv_heads;
+    kv_flops = 2 * 2 * model.emb_dim * model.head_dim * model.num_kv_heads
+    # QK^T = QK^T; for prefill Q: I x num_attention_heads x head_dim; K: I x head_dim x num_kv_heads; for AR, Q: 1 x num_attention_heads x head_dim; K: (I  + O) x head_dim x num_kv_heads
+    qkT_flops_pair = 2 * model.head_dim * model.num_attention_heads
+    qkT_flops_AR = 2 * model.head_dim * model.context_len * model.num_attention_heads
+    # QK^TV = QK^TV; for prefill QKT = I x I x num_attention_heads; V: I x head_dim x num_kv_heads; for AR, Q: 1 x (I + O) * num_attention_heads; V: (I + O) x head_dim x num_kv_heads
+    qkTV_flops_pair = 2 * model.head_dim * model.num_attention_heads
+    qkTV_flops_AR = 2 * model.context_len * model.head_dim * 1 * model.num_attention_heads
+    # O = Concat(qkTV)Wo; Wo: emb_dim x num_attention_heads x head_dim; for prefill qkTV: I x head_dim x num_attention_heads; for AR qkTV: 1 x head_dim x num_attention_heads
+    o_flops = 2 * model.emb_dim * model.emb_dim
+    # FFN = (Swish(OW1) + OW2)W3; W1: emb_dim x ffn_dim; W2: emb_dim x nffn_dim; W3: ffn_dim x emb_dim; for refill O: I x emb_dim, for AR, O = 1 x emb_dim
+    ffn_flops = 2 * model.ffn_layers * model.emb_dim * model.ffn_dim
+    # FLL = O x WLL; WLL: emb_dim x vocab_size; for prefill O: I x emb_dim; for AR, O = 1 x emb_dim
+    fll_flops = 2 * model.emb_dim * model.vocab_size
+
+    # memory transfers, for one token (AR; prefill is I tokens)
+    # Q = XWq; read X once from act. mem and write each Q to act. mem. 
+    q_act_mem_transfer = 1 * model.emb_dim + (1 * model.head_dim) * model.num_attention_heads
+    # K/V = XWk/XWv; write K/V to KV$. X reaad once alrady for Q above. 
+    kv_cache_mem_transfer = 2 * (1 * model.head_dim) * model.num_kv_heads
+    # QK^T = QK^T; read Q from act. mem and K from KV$ and write result to act. mem (I x I per head for prefill). For GQA, each KV$ is reach G times per group, for n_kv groups with n_h/n_kv heads per group
+    qkT_act_mem_transfer_token = 1 * model.head_dim * model.num_attention_heads
+    qkT_act_mem_transfer_AR = (1 * model.head_dim + 1 * model.context_len) * model.num_attention_heads
+    qkT_cache_mem_transfer_AR = (model.context_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
+    # QK^TV = QK^TV; read QK^T from act. mem and V from KV$ and write result to act. mem. For GQA, each KV$ is reach G times per group, for n_kv groups with n_h/n_kv heads per group
+    qkTV_act_mem_transfer_token = 1 * model.head_dim * model.num_attention_heads
+    qkTV_act_mem_transfer_AR = (1 * model.context_len + 1 * model.head_dim) * model.num_attention_heads
+    qkTV_cache_mem_transfer_AR = (model.context_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
+    # O = Concat(qkTV)Wo; read qkTV from act. mem and Wo from weight mem and write result to act. mem.
+    o_act_mem_transfer = 1 * model.head_dim * model.num_attention_heads + model.emb_dim
+    # FFN = (Swish(OW1) + OW2)W3; read O from act. mem and write swish(OW1), OW2, and final product result to act. mem. Reread Swish(OW1) and OW2.
+    ffn_act_mem_transfer = 1 * model.emb_dim + 2 * (model.ffn_layers - 1) * 1 * model.ffn_dim + model.emb_dim
+    # FLL = O x WLL; read O from act. mem and write result to act. mem.
+    fll_act_mem_transfer = 1 * model.emb_dim + 1 * model.vocab_size
+
+    act_token = in_out_act + query_act + qkTV_act + o_act + ffn_act
+    q_o_ffn_mem_transfer = q_act_mem_transfer + o_act_mem_transfer + ffn_act_mem_transfer
+    return ModelInvariants(
+        params=params,
+        weights_layer=w_tot_layer,
+        weights_fll=w_ll,
+        kv_cache_user=kv_cache_user,
+        act_token=act_token,
+        act_pair=model.num_attention_heads,
+        act_AR=act_token + qkT_act_AR,
+        fll_act=fll_act,
+        flops_weights=q_flops + kv_flops + o_flops + ffn_flops,
+        flops_kv=kv_flops,
+        flops_attention_pair=qkT_flops_pair + qkTV_flops_pair,
+        flops_attention_AR=qkT_flops_AR + qkTV_flops_AR,
+        fll_flops=fll_flops,
+        weight_mem_transfer=params[0]*1000**3,
+        act_mem_transfer_token=q_o_ffn_mem_transfer + qkT_act_mem_transfer_token + qkTV_act_mem_transfer_token,
+        act_mem_transfer_pair=2 * model.num_attention_heads,
+        act_mem_transfer_AR=q_o_ffn_mem_transfer + qkT_act_mem_transfer_AR + qkTV_act_mem_transfer_AR,
+        kv_cache_mem_transfer=kv_cache_mem_transfer,
+        kv_cache_read_AR=qkT_cache_mem_transfer_AR + qkTV_cache_mem_transfer_AR,
+        fll_act_mem_transfer=fll_act_mem_transfer,
+    )
+
+@instrument
+def calculate_total_params(model):
+    # calculate total number of parameters (weights) in the model 
+    total_weights, w_tot_layer, per_layer_weights = model_invariants(model).params
+
     # return total weights in GB, total weights per layer in GB, and per layer weights in GB
-    return total_weights/1000**3, w_tot_layer/1000**3, [value/1000**3 for value in per_layer_weights]
+    return total_weights, w_tot_layer, list(per_layer_weights)
 
+@instrument
 def calculate_total_KV_cache_size(model, users):
     # calculate total size of key-value cache (G)
     # We assume that even if the max context length > context length (the maximum number of tokens than can be processed in parallel), the kv$ must be able to store the maximum context length
     
     # per layer K/V cache
-    kv_cache = 2 * model.num_kv_heads * model.head_dim * model.max_context_len * users
+    kv_cache = model_invariants(model).kv_cache_user * users
 
     # total K/V cache for all layers
     total_kv_cache = kv_cache * model.layers
 
     return total_kv_cache/1000**3, kv_cache/1000**3
 
+@instrument
 def calculate_activations(model, input_len, users):
     # calculate total number of activations (G). We assume each layer processes max 1 user
     # max_seq_len: maximum sequence length; users: number of users
     # prefill: batch processing prompts with I input tokens to pre-fill I K/V pair; AR: serially producing O output tokens using I cached K/V pairs
     # Context_len = I + O
     # since each layer processes max 1 user at a time, the maximum number of concurrent layers processing is min(model.layers, users)
-    
-    # per input/output activations; in is the input prompt/token, out is the output prompt/token
-    in_out_prefill = 2 * input_len* model.emb_dim
-    in_out_AR = 2 * 1 * model.emb_dim 
-
-    # per layer query activations; Query (Q) = XWq
-    query_prefill = input_len * model.num_attention_heads * model.head_dim
-    query_AR = 1 * model.num_attention_heads * model.head_dim
-
-    # per layer attention matrix activations; qkT = QK^T. We exclude the softmax operation for activation calculation
-    qkT_prefill = input_len * input_len * model.num_attention_heads
-    qkT_AR = 1 * model.context_len * model.num_attention_heads
+    invariants = model_invariants(model)
+    concurrent_layers = min(model.layers, users)
 
-    # qkTV = (QK^T)V.
-    qkTV_prefill = input_len * model.head_dim * model.num_attention_heads
-    qkTV_AR = 1 * model.head_dim * model.num_attention_heads
+    # per layer activations; the prefill attention matrix is I x I per head
+    act_prefill = invariants.act_token * input_len + invariants.act_pair * input_len * input_len
+    act_pair_AR = invariants.act_AR - invariants.act_token
 
-    # O = Concat(qkTV)Wo. Concatenate the qkTVs from each attention head and multiply by Wo
-    o_prefill = input_len * model.emb_dim
-    o_AR = 1 * model.emb_dim
-
-    # FFN activations; FFN = (Swish(OW1) + OW2)W3 for LLama Models
-    ffn_prefill = (model.ffn_layers - 1) * input_len * model.ffn_dim + input_len * model.emb_dim
-    ffn_AR = (model.ffn_layers - 1) * 1 * model.ffn_dim + model.emb_dim
-
-    # FLL activations
-    fll_prefill = input_len * model.vocab_size
-    fll_AR = 1 * model.vocab_size 
+    # maximum total activations for all layers; every per-token term peaks in prefill once I >= 1
+    tokens = max(input_len, 1)
+    max_total_activations = invariants.act_token * tokens + max(invariants.act_pair * input_len * input_len, act_pair_AR)
+    max_total_activations = max_total_activations * concurrent_layers + invariants.fll_act * tokens
 
-    # maximum total activations for all layers
-    max_total_activations = max(in_out_prefill, in_out_AR) + max(query_prefill, query_AR) + max(qkT_prefill, qkT_AR) + max(qkTV_prefill, qkTV_AR) + max(o_prefill, o_AR) + max(ffn_prefill, ffn_AR)
-    max_total_activations = max_total_activations * min(model.layers, users) + max(fll_prefill, fll_AR)
-
-    total_activations_prefill = in_out_prefill + query_prefill + qkT_prefill + qkTV_prefill + o_prefill + ffn_prefill
-    total_activations_prefill = total_activations_prefill * min(model.layers, users) + fll_prefill
-
-    total_activations_AR = in_out_AR + query_AR + qkT_AR + qkTV_AR + o_AR + ffn_AR
-    total_activations_AR = total_activations_AR * min(model.layers, users) + fll_AR
+    total_activations_prefill = act_prefill * concurrent_layers + invariants.fll_act * input_len
+    total_activations_AR = invariants.act_AR * concurrent_layers + invariants.fll_act
 
     return max_total_activations/1000**3, total_activations_prefill/1000**3, total_activations_AR/1000**3
 
+@instrument
 def calculate_total_flops(model, input_len, users):
     # calculate total number of FLOPs. We assume each layer processes max 1 user. 
     # context_len: length of the context; users: number of users
     # compute flops count for OI calculations:
+    invariants = model_invariants(model)
+    concurrent_layers = min(model.layers, users)
 
-    # store Gflops per parameter storage type (weighht LtRAM, KV$ StRAM, activations StRAM) for prefill and AR
-    prefill_flops_breakdown = []
-    AR_flops_breakdown = []
-
-    # Q = XWq; for AR, x = 1 x emb_dim; for prefill, x = I x emb_dim; Wq: emb_dim x num_attention_heads x head_dim;
-    q_flops_prefill = 2 * model.emb_dim * model.num_attention_heads * model.head_dim * input_len
-    q_flops_AR = 2 * model.emb_dim * model.num_attention_heads * model.head_dim
-
-    # K/V = XWk/XWv; for AR, x = 1 x emb_dim; for prefill, x = I x emb_dim; Wk/Wv: emb_dim x head_dim x num_kv_heads;
-    kv_flops_prefill = 2 * 2 * model.emb_dim * model.head_dim * model.num_kv_heads * input_len  
-    kv_flops_AR = 2 * 2 * model.emb_dim * model.head_dim * model.num_kv_heads
-
-    # QK^T = QK^T; for prefill Q: I x num_attention_heads x head_dim; K: I x head_dim x num_kv_heads; for AR, Q: 1 x num_attention_heads x head_dim; K: (I  + O) x head_dim x num_kv_heads
-    qkT_flops_prefill = 2 * model.head_dim * input_len * input_len * model.num_attention_heads
-    qkT_flops_AR = 2 * model.head_dim * model.context_len * model.num_attention_heads
-
-    # QK^TV = QK^TV; for prefill QKT = I x I x num_attention_heads; V: I x head_dim x num_kv_heads; for AR, Q: 1 x (I + O) * num_attention_heads; V: (I + O) x head_dim x num_kv_heads
-    qkTV_flops_prefill = 2 * input_len * model.head_dim * input_len * model.num_attention_heads
-    qkTV_flops_AR = 2 * model.context_len * model.head_dim * 1 * model.num_attention_heads
-
-    # O = Concat(qkTV)Wo; Wo: emb_dim x num_attention_heads x head_dim; for prefill qkTV: I x head_dim x num_attention_heads; for AR qkTV: 1 x head_dim x num_attention_heads
-    o_flops_prefill = 2 * model.emb_dim * model.emb_dim * input_len
-    o_flops_AR = 2 * model.emb_dim * model.emb_dim
-
-    # FFN = (Swish(OW1) + OW2)W3; W1: emb_dim x ffn_dim; W2: emb_dim x nffn_dim; W3: ffn_dim x emb_dim; for refill O: I x emb_dim, for AR, O = 1 x emb_dim
-    ffn_flops_prefill = 2 * model.ffn_layers * model.emb_dim * input_len * model.ffn_dim
-    ffn_flops_AR = 2 * model.ffn_layers * model.emb_dim * model.ffn_dim 
-
-    # FLL = O x WLL; WLL: emb_dim x vocab_size; for prefill O: I x emb_dim; for AR, O = 1 x emb_dim
-    fll_flops_prefill = 2 * model.emb_dim * model.vocab_size * input_len
-    fll_flops_AR = 2 * model.emb_dim * model.vocab_size
+    # prefill processes I tokens; QK^T and QK^TV cover I x I (query, key) pairs
+    weights_prefill = invariants.flops_weights * input_len
+    attention_prefill = invariants.flops_attention_pair * input_len * input_len
+    kv_prefill = invariants.flops_kv * input_len
+    fll_prefill = invariants.fll_flops * input_len
 
     # total FLOPs for all layers
-    total_flops_prefill = min(model.layers, users) * (q_flops_prefill + kv_flops_prefill + qkT_flops_prefill + qkTV_flops_prefill + o_flops_prefill + ffn_flops_prefill) + fll_flops_prefill
-    total_flops_AR = min(model.layers, users) * (q_flops_AR + kv_flops_AR + qkT_flops_AR + qkTV_flops_AR + o_flops_AR + ffn_flops_AR) + fll_flops_AR
-
-    prefill_flops_breakdown.append(min(model.layers, users) * (q_flops_prefill + kv_flops_prefill + o_flops_prefill + ffn_flops_prefill) + fll_flops_prefill)
-    prefill_flops_breakdown.append(total_flops_prefill)
-    prefill_flops_breakdown.append(min(model.layers, users) * (qkT_flops_prefill + qkTV_flops_prefill + kv_flops_prefill))
+    total_flops_prefill = concurrent_layers * (weights_prefill + attention_prefill) + fll_prefill
+    total_flops_AR = concurrent_layers * (invariants.flops_weights + invariants.flops_attention_AR) + invariants.fll_flops
 
-    AR_flops_breakdown.append(min(model.layers, users) * (q_flops_AR + kv_flops_AR + o_flops_AR + ffn_flops_AR) + fll_flops_AR)
-    AR_flops_breakdown.append(total_flops_AR)    
-    AR_flops_breakdown.append(min(model.layers, users) * (qkT_flops_AR + qkTV_flops_AR + kv_flops_AR))
+    # Gflops per parameter storage type (weighht LtRAM, total, KV$ StRAM) for prefill and AR
+    prefill_flops_breakdown = [concurrent_layers * weights_prefill + fll_prefill, total_flops_prefill,
+                               concurrent_layers * (attention_prefill + kv_prefill)]
+    AR_flops_breakdown = [concurrent_layers * invariants.flops_weights + invariants.fll_flops, total_flops_AR,
+                          concurrent_layers * (invariants.flops_attention_AR + invariants.flops_kv)]
 
     return max(total_flops_prefill, total_flops_AR)/1000**3, [value /1000**3 for value in prefill_flops_breakdown], [value/1000**3 for value in AR_flops_breakdown]
 
+@instrument
 def calculate_total_mem_transfer(model, input_len, users):
     # calculate total number of memory transfers. We assume each layer processes max 1 user. 
     # context_len: length of the context; users: number of users
     # compute memory transfer count for OI calculations:
+    invariants = model_invariants(model)
+    concurrent_layers = min(model.layers, users)
 
-    # store memory transfer (G) per parameter storage type (weighht LtRAM, KV$ StRAM, activations StRAM) for prefill and AR
-    prefill_mem_transfer_breakdown = []
-    AR_mem_transfer_breakdown = []
-
-    weight_mem_transfer = calculate_total_params(model)[0]*1000**3    
-    prefill_mem_transfer_breakdown.append(weight_mem_transfer)
-    AR_mem_transfer_breakdown.append(weight_mem_transfer)
-
-    # Q = XWq; read X once from act. mem and write each Q to act. mem. 
-    q_act_mem_transfer_prefill = input_len* model.emb_dim + (input_len * model.head_dim) * model.num_attention_heads
-    q_act_mem_transfer_AR = 1 * model.emb_dim + (1 * model.head_dim) * model.num_attention_heads
-
-    # K/V = XWk/XWv; write K/V to KV$. X reaad once alrady for Q above. 
-    kv_cache_mem_transfer_prefill = 2 * (input_len * model.head_dim) * model.num_kv_heads
-
-    kv_cache_mem_transfer_AR = 2 * (1 * model.head_dim) * model.num_kv_heads # write K/V to KV$
-
-    # QK^T = QK^T; read Q from act. mem and K from KV$ and write result to act. mem. For GQA, each KV$ is reach G times per group, for n_kv groups with n_h/n_kv heads per group
-    qkT_act_mem_transfer_prefill = (input_len * model.head_dim + input_len * input_len) * model.num_attention_heads
-    qkT_cache_mem_transfer_prefill = (input_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
-  
-    qkT_act_mem_transfer_AR = (1 * model.head_dim + 1 * model.context_len) * model.num_attention_heads
-    qkT_cache_mem_transfer_AR = (model.context_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
-
-    # QK^TV = QK^TV; read QK^T from act. mem and V from KV$ and write result to act. mem. For GQA, each KV$ is reach G times per group, for n_kv groups with n_h/n_kv heads per group
-    qkTV_act_mem_transfer_prefill = (input_len * input_len + input_len * model.head_dim) * model.num_attention_heads
-    qkTV_cache_mem_transfer_prefill = (input_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
-
-    qkTV_act_mem_transfer_AR = (1 * model.context_len + 1 * model.head_dim) * model.num_attention_heads
-    qkTV_cache_mem_transfer_AR = (model.context_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
-
-    # O = Concat(qkTV)Wo; read qkTV from act. mem and Wo from weight mem and write result to act. mem.
-    o_act_mem_transfer_prefill = input_len * model.head_dim * model.num_attention_heads + input_len * model.emb_dim
-    o_act_mem_transfer_AR = 1 * model.head_dim * model.num_attention_heads + model.emb_dim
-
-    # FFN = (Swish(OW1) + OW2)W3; read O from act. mem and write swish(OW1), OW2, and final product result to act. mem. Reread Swish(OW1) and OW2.
-    ffn_act_mem_transfer_prefill = input_len * model.emb_dim + 2 * (model.ffn_layers - 1) * input_len * model.ffn_dim + input_len * model.emb_dim
-    ffn_act_mem_transfer_AR = 1 * model.emb_dim + 2 * (model.ffn_layers - 1) * 1 * model.ffn_dim + model.emb_dim
-
-    # FLL = O x WLL; read O from act. mem and write result to act. mem.
-    fll_act_mem_transfer_prefill = input_len * model.emb_dim + input_len * model.vocab_size
-    fll_act_mem_transfer_AR = 1 * model.emb_dim + 1 * model.vocab_size
+    # QK^T and QK^TV each read the I cached K/V of every head. For GQA, each KV$ is reach G times per group, for n_kv groups with n_h/n_kv heads per group
+    cache_read_prefill = (input_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
 
     # total memory transfer for all layers
-    total_act_mem_transfer_prefill = (q_act_mem_transfer_prefill  + qkT_act_mem_transfer_prefill + qkTV_act_mem_transfer_prefill + o_act_mem_transfer_prefill + 
-                                      ffn_act_mem_transfer_prefill) * min(model.layers, users) + fll_act_mem_transfer_prefill
+    total_act_mem_transfer_prefill = (invariants.act_mem_transfer_token * input_len + invariants.act_mem_transfer_pair * input_len * input_len) * concurrent_layers + invariants.fll_act_mem_transfer * input_len
+    total_act_mem_transfer_AR = invariants.act_mem_transfer_AR * concurrent_layers + invariants.fll_act_mem_transfer
 
-    total_act_mem_transfer_AR = (q_act_mem_transfer_AR + qkT_act_mem_transfer_AR + qkTV_act_mem_transfer_AR + o_act_mem_transfer_AR + 
-                                 ffn_act_mem_transfer_AR) * min(model.layers, users) + fll_act_mem_transfer_AR
-    
-    total_kv_mem_transfer_prefill = (kv_cache_mem_transfer_prefill + qkT_cache_mem_transfer_prefill + qkTV_cache_mem_transfer_prefill) * min(model.layers, users)
-    total_kv_mem_transfer_AR = (kv_cache_mem_transfer_AR + qkT_cache_mem_transfer_AR + qkTV_cache_mem_transfer_AR) * min(model.layers, users)
-
-    prefill_mem_transfer_breakdown.append(total_act_mem_transfer_prefill)
-    prefill_mem_transfer_breakdown.append(total_kv_mem_transfer_prefill)
+    total_kv_mem_transfer_prefill = (invariants.kv_cache_mem_transfer * input_len + 2 * cache_read_prefill) * concurrent_layers
+    total_kv_mem_transfer_AR = (invariants.kv_cache_mem_transfer + invariants.kv_cache_read_AR) * concurrent_layers
 
-    AR_mem_transfer_breakdown.append(total_act_mem_transfer_AR)
-    AR_mem_transfer_breakdown.append(total_kv_mem_transfer_AR)
+    # memory transfer (G) per parameter storage type (weighht LtRAM, activations StRAM, KV$ StRAM) for prefill and AR
+    prefill_mem_transfer_breakdown = [invariants.weight_mem_transfer, total_act_mem_transfer_prefill, total_kv_mem_transfer_prefill]
+    AR_mem_transfer_breakdown = [invariants.weight_mem_transfer, total_act_mem_transfer_AR, total_kv_mem_transfer_AR]
 
     return [value/1000**3 for value in prefill_mem_transfer_breakdown], [value/1000**3 for value in AR_mem_transfer_breakdown]
 
-#def calculate_storage(model, w_res, act_res, input_len, users):
+@instrument
+def calculate_storage(model, w_res, act_res, input_len, users, kv_res=None):
     # calculate weight storage, KV$, and activation storage in GB
-    # w_res: weight resolution in bits; act_res: activation resolution in bits
+    # w_res: weight resolution in bits; act_res: activation resolution in bits; kv_res: KV$ resolution in bits (defaults to act_res)
+    kv_res = act_res if kv_res is None else kv_res
     total_weights, total_kv_cache, total_activations = calculate_total_params(model)[0], calculate_total_KV_cache_size(model, users)[0], calculate_activations(model, input_len, users)[0]
     weight_storage = total_weights * (w_res / 8)
     
-    kv_storage = total_kv_cache * (act_res / 8)
+    kv_storage = total_kv_cache * (kv_res / 8)
 
     act_storage = total_activations * (act_res / 8)
 
     return weight_storage, act_storage, kv_storage
-
-
-
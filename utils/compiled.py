@@ -0,0 +1,152 @@
+import numpy as np
+
+from utils.calculations import compute_invariants
+
+# Every quantity in utils/calculations.py is a low-degree polynomial in the prefill input length I, the context length
+# C, the number of concurrently active layers p = min(layers, users) and the number of users U. compile_models turns a
+# model (or a whole ModelTable) into a coefficient table over the monomials below once; evaluate() is then a fixed
+# polynomial evaluation. Coefficients are raw element / operation counts; evaluate() converts to G like calculations.py.
+
+MONOMIALS = ("1", "I", "I^2", "C", "p", "p*I", "p*I^2", "p*C", "U")
+
+QUANTITIES = (
+    "params", "kv_layer", "kv_total",
+    "flops_prefill", "flops_prefill_weights", "flops_prefill_attention",
+    "flops_AR", "flops_AR_weights", "flops_AR_attention",
+    "mem_prefill_act", "mem_prefill_kv", "mem_AR_act", "mem_AR_kv",
+    "act_prefill", "act_AR",
+)
+
+# evaluate() outputs: every compiled quantity plus the max-over-stages totals
+OUTPUTS = QUANTITIES + ("peak_flops", "act_max")
+
+FORMAT_VERSION = 2
+
+
+class CompiledModels:
+    """
+    Coefficient table of shape (len(QUANTITIES), len(MONOMIALS)) + model shape, plus the per-model layer counts
+    needed to form p = min(layers, users) and the default context lengths.
+    """
+    __slots__ = ("coefficients", "layers", "context_len", "name")
+
+    def __init__(self, coefficients, layers, context_len, name):
+        self.coefficients = coefficients
+        self.layers = layers
+        self.context_len = context_len
+        self.name = name
+
+    def __len__(self):
+        return 1 if np.ndim(self.layers) == 0 else len(self.layers)
+
+    def coefficient(self, quantity, monomial):
+        return self.coefficients[QUANTITIES.index(quantity), MONOMIALS.index(monomial)]
+
+    def broadcast(self, ndim=1):
+        # (.., M, 1, ..., 1) so the model axis broadcasts against ndim trailing sweep axes, as ModelTable.broadcast
+        shape = self.coefficients.shape + (1,) * ndim
+        extra = (1,) * ndim
+        return CompiledModels(self.coefficients.reshape(shape), np.reshape(self.layers, np.shape(self.layers) + extra),
+                              np.reshape(self.context_len, np.shape(self.context_len) + extra), self.name)
+
+
+def compile_models(model):
+    """
+    Compiles an LLMModel or a ModelTable into closed-form cost polynomials.
+
+    Parameters:
+        model (LLMModel or ModelTable): Model(s) to compile; table columns give one coefficient set per row.
+
+    Returns:
+        CompiledModels: Coefficient table over MONOMIALS for every name in QUANTITIES.
+    """
+    # the coefficients are the ModelInvariants of utils/calculations.py, computed once for every row of the table.
+    # An AR token attends to C cached positions the way a prefill token attends to I, so the per-C coefficients of
+    # the AR attention terms are the per-pair coefficients of the prefill ones.
+    inv = compute_invariants(model)
+    layers = np.asarray(model.layers)
+    rows = {quantity: {} for quantity in QUANTITIES}
+
+    rows["params"]["1"] = inv.weights_layer * model.layers + inv.weights_fll
+    rows["kv_layer"]["U"] = inv.kv_cache_user
+    rows["kv_total"]["U"] = inv.kv_cache_user * model.layers
+
+    rows["flops_prefill"].update({"p*I": inv.flops_weights, "p*I^2": inv.flops_attention_pair, "I": inv.fll_flops})
+    rows["flops_prefill_weights"].update({"p*I": inv.flops_weights, "I": inv.fll_flops})
+    rows["flops_prefill_attention"].update({"p*I": inv.flops_kv, "p*I^2": inv.flops_attention_pair})
+    rows["flops_AR"].update({"p": inv.flops_weights, "p*C": inv.flops_attention_pair, "1": inv.fll_flops})
+    rows["flops_AR_weights"].update({"p": inv.flops_weights, "1": inv.fll_flops})
+    rows["flops_AR_attention"].update({"p": inv.flops_kv, "p*C": inv.flops_attention_pair})
+
+    # prefill reads every cached K/V twice (QK^T and (QK^T)V) on top of writing it
+    rows["mem_prefill_act"].update({"p*I": inv.act_mem_transfer_token, "p*I^2": inv.act_mem_transfer_pair, "I": inv.fll_act_mem_transfer})
+    rows["mem_prefill_kv"].update({"p*I": 2 * inv.kv_cache_mem_transfer})
+    rows["mem_AR_act"].update({"p": inv.act_mem_transfer_token, "p*C": inv.act_mem_transfer_pair, "1": inv.fll_act_mem_transfer})
+    rows["mem_AR_kv"].update({"p": inv.kv_cache_mem_transfer, "p*C": inv.kv_cache_mem_transfer})
+
+    rows["act_prefill"].update({"p*I": inv.act_token, "p*I^2": inv.act_pair, "I": inv.fll_act})
+    rows["act_AR"].update({"p": inv.act_token, "p*C": inv.act_pair, "1": inv.fll_act})
+
+    coefficients = np.zeros((len(QUANTITIES), len(MONOMIALS)) + layers.shape)
+    for q, quantity in enumerate(QUANTITIES):
+        for monomial, value in rows[quantity].items():
+            coefficients[q, MONOMIALS.index(monomial)] = value
+    return CompiledModels(coefficients, layers, np.asarray(model.context_len), np.asarray(model.name))
+
+
+def evaluate(compiled, users, input_len, context_len=None, quantities=OUTPUTS):
+    """
+    Evaluates compiled cost polynomials; users, input_len and context_len broadcast against the model axis.
+
+    Returns:
+        dict: Quantity name -> array in G (elements, FLOPs or transfers), plus "peak_flops" and "act_max"
+            (the max-over-stages totals returned first by calculate_total_flops and calculate_activations).
+    """
+    I = np.asarray(input_len, dtype=np.float64)
+    C = np.asarray(compiled.context_len if context_len is None else context_len, dtype=np.float64)
+    U = np.asarray(users)
+    p = np.minimum(compiled.layers, U)
+    # monomials are formed on first use only
+    builders = {"1": lambda: 1.0, "I": lambda: I, "I^2": lambda: I * I, "C": lambda: C, "p": lambda: p,
+                "p*I": lambda: p * I, "p*I^2": lambda: p * (I * I), "p*C": lambda: p * C, "U": lambda: U}
+    monomials = {}
+
+    wanted = set(quantities)
+    if "peak_flops" in wanted:
+        wanted.update(("flops_prefill", "flops_AR"))
+
+    raw = {}
+    for quantity in wanted & set(QUANTITIES):
+        row = compiled.coefficients[QUANTITIES.index(quantity)]
+        value = 0.0
+        for k, monomial in enumerate(MONOMIALS):
+            if np.any(row[k]):
+                if monomial not in monomials:
+                    monomials[monomial] = builders[monomial]()
+                value = value + row[k] * monomials[monomial]
+        raw[quantity] = value
+
+    if "peak_flops" in wanted:
+        raw["peak_flops"] = np.maximum(raw["flops_prefill"], raw["flops_AR"])
+    if "act_max" in wanted:
+        # every per-token term peaks in prefill once I >= 1, the attention matrix in whichever stage holds more pairs
+        # (the same max as calculate_activations)
+        act_AR = compiled.coefficients[QUANTITIES.index("act_AR")]
+        act_token, act_pair, fll_act = (act_AR[MONOMIALS.index(monomial)] for monomial in ("p", "p*C", "1"))
+        tokens = np.maximum(I, 1)
+        raw["act_max"] = (act_token * tokens + np.maximum(act_pair * I * I, act_pair * C)) * p + fll_act * tokens
+
+    return {quantity: raw[quantity] / 1000**3 for quantity in quantities}
+
+
+def save_compiled(path, compiled):
+    np.savez(path, coefficients=compiled.coefficients, layers=compiled.layers, context_len=compiled.context_len,
+             name=compiled.name, quantities=np.array(QUANTITIES), monomials=np.array(MONOMIALS),
+             format_version=FORMAT_VERSION)
+
+
+def load_compiled(path):
+    with np.load(path) as data:
+        if int(data["format_version"]) != FORMAT_VERSION or tuple(data["quantities"]) != QUANTITIES or tuple(data["monomials"]) != MONOMIALS:
+            raise ValueError(f"{path} was compiled with a different coefficient layout; recompile it")
+        return CompiledModels(data["coefficients"], data["layers"], data["context_len"], data["name"])
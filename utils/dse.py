@@ -0,0 +1,189 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from utils.vectorized import calculate_chip_area, calculate_num_chips
+
+# Design-space exploration over the hardware parameters of plot_model_chip_requirements. The sweep grid is the
+# cartesian product models x users x every hardware axis; it is never materialised. Each worker expands a contiguous
+# range of flat grid indices, evaluates it with utils/vectorized.py and writes the chunk straight to disk, so memory
+# stays bounded by chunk_size x workers whatever the grid size, and an interrupted sweep resumes from the chunks
+# already on disk.
+
+HARDWARE_AXES = ("weight_density", "weight_tiers", "kv_density", "act_density", "tmacs_per_mm2", "w_res", "act_res", "kv_res")
+RESULT_FIELDS = ("total_area", "weight_area", "sram_area", "compute_area", "num_reticle_chips")
+DEFAULT_USERS = np.arange(1, 257, 8)
+
+_worker_state = {}
+
+
+class SweepMismatchError(ValueError):
+    # raised when out_dir already holds the manifest of a different sweep
+    pass
+
+
+def hardware_values(hardware):
+    # every HARDWARE_AXES entry of a hardware dict (single values or axes); kv_res may be missing or None and then
+    # follows act_res
+    values = {name: hardware[name] for name in HARDWARE_AXES if name != "kv_res"}
+    values["kv_res"] = hardware["act_res"] if hardware.get("kv_res") is None else hardware["kv_res"]
+    return values
+
+
+def grid_shape(models, users, axes):
+    return (len(models), len(users)) + tuple(len(axes[name]) for name in HARDWARE_AXES)
+
+
+def expand_chunk(models, users, axes, start, stop):
+    # flat grid indices [start, stop) -> model rows and per-point sweep values
+    shape = grid_shape(models, users, axes)
+    index = np.unravel_index(np.arange(start, stop, dtype=np.int64), shape)
+    values = {"users": np.asarray(users)[index[1]]}
+    for name, axis_index in zip(HARDWARE_AXES, index[2:]):
+        values[name] = np.asarray(axes[name], dtype=np.float64)[axis_index]
+    return index[0], values
+
+
+def evaluate_chunk(models, users, axes, start, stop, input_len=None):
+    model_index, values = expand_chunk(models, users, axes, start, stop)
+    chunk_models = models.take(model_index)
+    # prefill input length defaults to half the model context length, as in plot_model_chip_requirements
+    chunk_input_len = chunk_models.context_len * 0.5 if input_len is None else input_len
+    total_area, weight_area, sram_area, compute_area = calculate_chip_area(chunk_models, values["users"], chunk_input_len,
+                                                                           *(values[name] for name in HARDWARE_AXES))
+    results = {"total_area": total_area, "weight_area": weight_area, "sram_area": sram_area,
+               "compute_area": compute_area, "num_reticle_chips": calculate_num_chips(total_area)}
+    return model_index, values, results
+
+
+def run_sweep(models, axes, out_dir, users=DEFAULT_USERS, input_len=None, chunk_size=1_000_000, workers=None, fmt="npz", cache=None):
+    """
+    Sweeps every model jointly across all hardware axes on a process pool, streaming results to disk per chunk.
+
+    Parameters:
+        models (ModelTable): Models to sweep.
+        axes (dict): Values for every name in HARDWARE_AXES (weight_density, weight_tiers, kv_density, act_density,
+            tmacs_per_mm2, w_res, act_res, kv_res); kv_res defaults to act_res.
+        out_dir (str): Output directory; holds manifest.json and one chunk_XXXXXX.npz/.csv file per chunk. Raises
+            SweepMismatchError if it holds a sweep of other models (by name or spec), axes or chunking.
+        users (array): Number of users axis.
+        input_len (float): Prefill input length; defaults to half of each model's context length.
+        chunk_size (int): Grid points per chunk.
+        workers (int): Number of processes; defaults to all cores.
+        fmt (str): "npz" or "csv".
+        cache (ResultCache): Optional utils.result_cache cache; chunks are then served from it, and only the
+            (model, hardware point) cells or users it does not hold yet are computed.
+
+    Returns:
+        int: Number of chunks computed by this call (chunks already on disk are skipped).
+    """
+    axes = {name: list(np.atleast_1d(values).tolist()) for name, values in hardware_values(axes).items()}
+    users = np.asarray(users)
+    shape = grid_shape(models, users, axes)
+    total = int(np.prod(shape, dtype=np.int64))
+    num_chunks = -(-total // chunk_size)
+
+    manifest = {"models": models.name.tolist(), "models_digest": models.digest(), "users": users.tolist(), "axes": axes, "shape": list(shape),
+                "input_len": input_len, "chunk_size": chunk_size, "num_chunks": num_chunks, "format": fmt}
+    _write_manifest(out_dir, manifest)
+
+    pending = [chunk for chunk in range(num_chunks) if not os.path.exists(chunk_path(out_dir, chunk, fmt))]
+    if not pending:
+        return 0
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(models, users, axes, input_len, out_dir, chunk_size, total, fmt, cache)) as pool:
+        # keep a bounded number of chunks in flight so the task queue does not grow with the grid
+        in_flight = set()
+        for chunk in pending:
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            in_flight.add(pool.submit(_run_chunk, chunk))
+        for future in in_flight:
+            future.result()
+    if cache is not None:
+        cache.evict()
+    return len(pending)
+
+
+def chunk_path(out_dir, chunk, fmt="npz"):
+    return os.path.join(out_dir, f"chunk_{chunk:06d}.{fmt}")
+
+
+def load_sweep(out_dir):
+    # yields one dict per chunk on disk with the grid values (model, users, hardware axes) and the results
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    names = np.array(manifest["models"])
+    shape = tuple(manifest["shape"])
+    users = np.asarray(manifest["users"])
+    for chunk in range(manifest["num_chunks"]):
+        path = chunk_path(out_dir, chunk, manifest["format"])
+        if not os.path.exists(path):
+            continue
+        if manifest["format"] == "npz":
+            # .npz chunks hold only the flat index and the results; the grid values are re-derived from the manifest
+            with np.load(path) as data:
+                columns = {key: data[key] for key in data.files}
+            index = np.unravel_index(columns["index"], shape)
+            columns["model"] = index[0]
+            columns["users"] = users[index[1]]
+            for name, axis_index in zip(HARDWARE_AXES, index[2:]):
+                columns[name] = np.asarray(manifest["axes"][name], dtype=np.float64)[axis_index]
+        else:
+            data = np.genfromtxt(path, delimiter=",", names=True)
+            columns = {key: data[key] for key in data.dtype.names}
+        columns["model_name"] = names[columns["model"].astype(np.intp)]
+        yield columns
+
+
+def _write_manifest(out_dir, manifest):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "manifest.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise SweepMismatchError(f"{out_dir} holds a different sweep")
+        return
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def _init_worker(models, users, axes, input_len, out_dir, chunk_size, total, fmt, cache):
+    _worker_state.update(models=models, users=users, axes=axes, input_len=input_len, out_dir=out_dir,
+                         chunk_size=chunk_size, total=total, fmt=fmt, cache=cache)
+
+
+def _run_chunk(chunk):
+    state = _worker_state
+    start = chunk * state["chunk_size"]
+    stop = min(start + state["chunk_size"], state["total"])
+    if state["cache"] is None:
+        model_index, values, results = evaluate_chunk(state["models"], state["users"], state["axes"], start, stop, state["input_len"])
+    else:
+        from utils.result_cache import cached_chunk
+
+        model_index, values, results = cached_chunk(state["cache"], state["models"], state["users"], state["axes"], start,
+                                                    stop, state["input_len"])
+
+    columns = {"index": np.arange(start, stop, dtype=np.int64), **results}
+    path = chunk_path(state["out_dir"], chunk, state["fmt"])
+    # write to a temporary file and rename so a killed run never leaves a partial chunk behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        if state["fmt"] == "npz":
+            np.savez(f, **columns)
+        else:
+            columns = {"index": columns["index"], "model": model_index, **values, **results}
+            f.write((",".join(columns) + "\n").encode())
+            np.savetxt(f, np.column_stack([np.asarray(value, dtype=np.float64) for value in columns.values()]),
+                       delimiter=",", fmt="%.17g")
+    os.replace(tmp_path, path)
+    return chunk
@@ -0,0 +1,230 @@
+import numpy as np
+
+# Pareto (skyline) extraction over sweep results. All objectives are minimised; negate the ones to maximise (users,
+# context length). Two objectives are handled by one lexicographic sort plus a running minimum. For more objectives the
+# trailing columns are treated as group keys and every group is first reduced to its own two-objective front, all groups
+# in the same sort. The union of these fronts is then reduced by divide and conquer on the key columns (Kung, Luccio and
+# Preparata): split at the median key value, solve both halves, and drop the upper rows that a lower row weakly
+# dominates on the remaining columns. That filter recurses the same way and bottoms out in the sorted two-objective
+# sweep, so k objectives cost O(n log^(k-2) n) with vectorized leaves. Sweep axes such as users, context length or
+# precision have few distinct values, so the recursion stays shallow. The columns are reordered internally: the two with
+# the most distinct values become the two-objective axes and the rest the group keys, fewest values first. When the keys
+# still form many small groups (continuous objectives), the rows are first pruned against the skyline of a sample of
+# the rows closest to the ideal point instead.
+
+# blocks with at most this many row pairs are compared by broadcasting instead of recursing
+BRUTE_FORCE_PAIRS = 1 << 14
+# rows sampled to estimate the distinct values per column, and rows in the pruning sample
+DISTINCT_SAMPLE = 1 << 16
+PIVOT_SAMPLE = 1 << 10
+# the key columns group the rows when their groups average at least this many rows; otherwise the rows are pruned first
+MIN_GROUP_ROWS = 16
+
+
+def pareto_front(costs):
+    """
+    Returns a boolean mask of the Pareto-optimal rows of costs (all columns minimised).
+
+    Parameters:
+        costs (array): (n, k) objective values, or a list of k arrays of length n.
+
+    Returns:
+        array: (n,) bool mask; a row is kept unless another row is <= in every column and < in at least one.
+    """
+    costs = _as_costs(costs)
+    n, k = costs.shape
+    if k == 1:
+        return costs[:, 0] == costs[:, 0].min() if n else np.zeros(0, dtype=bool)
+    if k == 2 or n == 0:
+        return _front_2d(costs[:, 0], costs[:, 1]) if k == 2 else np.zeros(0, dtype=bool)
+
+    # the two columns with the most distinct values (counted on a strided sample) are the two-objective axes, the
+    # others group keys, fewest values first
+    sample = costs[::max(1, n // DISTINCT_SAMPLE)]
+    distinct = np.array([len(np.unique(column)) for column in sample.T])
+    order = np.argsort(distinct, kind="stable")
+    costs = costs[:, np.r_[order[-2:][::-1], order[:-2]]]
+
+    # keys that leave fewer than MIN_GROUP_ROWS rows per group on average prune little; drop the rows the pivot
+    # skyline dominates first
+    rows = np.arange(n)
+    if n > PIVOT_SAMPLE and np.prod(distinct[order[:-2]], dtype=np.float64) * MIN_GROUP_ROWS > len(sample):
+        rows = _prune(costs)
+        costs = costs[rows]
+
+    # mixed-radix code of the key columns, one np.unique per column (much cheaper than a row-wise unique); the code is
+    # only renumbered densely when the next column could overflow it
+    code, bound = np.zeros(len(rows), dtype=np.int64), 1
+    for column in costs[:, 2:].T:
+        values, inverse = np.unique(column, return_inverse=True)
+        if bound * len(values) >= 2**62:
+            code = np.unique(code, return_inverse=True)[1].ravel()
+            bound = len(rows)
+        code = code * len(values) + inverse.ravel()
+        bound *= len(values)
+
+    # two-objective front of every group; only these rows can be Pareto-optimal
+    candidates = np.flatnonzero(_grouped_front_2d(costs[:, 0], costs[:, 1], code))
+
+    # key columns first, so the recursion splits on them and ends in the two-objective sweep
+    mask = np.zeros(n, dtype=bool)
+    mask[rows[candidates[_skyline(costs[candidates][:, list(range(2, k)) + [0, 1]])]]] = True
+    return mask
+
+
+def pareto_indices(costs):
+    return np.flatnonzero(pareto_front(costs))
+
+
+def chip_requirement_front(results, maximize=("users",), minimize=("num_reticle_chips", "total_area")):
+    """
+    Pareto set of a sweep result dict (utils/dse.py, utils/result_cache.py or plotting.chip_requirements layout).
+
+    Returns:
+        array: Flat indices of the Pareto-optimal points.
+    """
+    columns = [np.ravel(results[name]) for name in minimize] + [-np.ravel(results[name]) for name in maximize]
+    return pareto_indices(columns)
+
+
+def _as_costs(costs):
+    if isinstance(costs, (list, tuple)):
+        costs = np.column_stack([np.ravel(column) for column in costs])
+    costs = np.asarray(costs, dtype=np.float64)
+    return costs if costs.ndim == 2 else costs.reshape(len(costs), 1)
+
+
+def _front_2d(x, y):
+    order = np.argsort(x)
+    mask = np.zeros(len(x), dtype=bool)
+    mask[order[_front_2d_sorted(x[order], y[order])]] = True
+    return mask
+
+
+def _front_2d_sorted(xs, ys):
+    # xs ascending; a point survives if it has the smallest y of its x and that y is below every point of smaller x
+    if len(xs) == 0:
+        return np.zeros(0, dtype=bool)
+    new_x = np.r_[True, xs[1:] != xs[:-1]]
+    x_group = np.cumsum(new_x) - 1
+    group_min = np.minimum.reduceat(ys, np.flatnonzero(new_x))
+    best_before = np.r_[np.inf, np.minimum.accumulate(group_min)[:-1]]
+    return (group_min < best_before)[x_group] & (ys == group_min[x_group])
+
+
+def _grouped_front_2d(x, y, group):
+    # two-objective front of every group in one pass: rows are ordered by (group, x) and y is replaced by its rank
+    # shifted down by n per group, so a single running minimum over the (group, x) blocks never leaks into a later group
+    n = len(x)
+    order = np.argsort(x)
+    order = order[np.argsort(group[order], kind="stable")]
+    groups, xs = group[order], x[order]
+    new_group = np.r_[True, groups[1:] != groups[:-1]]
+    shifted = np.unique(y, return_inverse=True)[1].ravel()[order] - (np.cumsum(new_group) - 1) * n
+    new_block = new_group | np.r_[True, xs[1:] != xs[:-1]]
+    block = np.cumsum(new_block) - 1
+    block_min = np.minimum.reduceat(shifted, np.flatnonzero(new_block))
+    best_before = np.r_[np.iinfo(np.int64).max, np.minimum.accumulate(block_min)[:-1]]
+    mask = np.zeros(n, dtype=bool)
+    mask[order[(block_min < best_before)[block] & (shifted == block_min[block])]] = True
+    return mask
+
+
+def _prune(costs):
+    # indices of the rows that the skyline of the PIVOT_SAMPLE rows nearest the ideal point (smallest sum of min-max
+    # scaled costs) does not strictly dominate
+    low, high = costs.min(axis=0), costs.max(axis=0)
+    with np.errstate(invalid="ignore"):
+        score = ((costs - low) / np.where(high > low, high - low, 1)).sum(axis=1)
+    sample = costs[np.argpartition(score, PIVOT_SAMPLE)[:PIVOT_SAMPLE]]
+    pivots = sample[_skyline(sample)]
+    # pivots never dominate each other, so a row lying between two of them (p <= row <= q) equals p = q and is kept
+    dominated = _filter(pivots, costs)
+    dominated[dominated] = ~_filter(-pivots, -costs[dominated])
+    return np.flatnonzero(~dominated)
+
+
+def _weakly_dominated(front_x, front_y, x, y):
+    # True where some (front_x, front_y) point is <= (x, y) in both coordinates
+    order = np.argsort(front_x, kind="stable")
+    fx, running_min = front_x[order], np.minimum.accumulate(front_y[order])
+    last = np.searchsorted(fx, x, side="right") - 1
+    return (last >= 0) & (running_min[np.maximum(last, 0)] <= y)
+
+
+def _skyline(points):
+    # mask of the rows that no other row dominates
+    n, k = points.shape
+    if k <= 2:
+        return _front_2d(points[:, 0], points[:, 1]) if k == 2 else points[:, 0] == points[:, 0].min()
+    if n * n <= BRUTE_FORCE_PAIRS:
+        return ~_dominated_brute_force(points, points, strict=True)
+    low = _split(points[:, 0])[0]
+    if low is None:
+        # the first column is constant and decides nothing
+        return _skyline(points[:, 1:])
+
+    # lower rows are strictly smaller in the first column, so only lower rows can dominate them, and an upper row is
+    # dominated by a lower one exactly when it is weakly dominated on the remaining columns
+    lower, upper = np.flatnonzero(low), np.flatnonzero(~low)
+    lower = lower[_skyline(points[lower])]
+    upper = upper[_skyline(points[upper])]
+    mask = np.zeros(n, dtype=bool)
+    mask[lower] = True
+    mask[upper[~_filter(points[lower, 1:], points[upper, 1:])]] = True
+    return mask
+
+
+def _filter(a, b):
+    # True for the rows of b that some row of a is <= in every column
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros(len(b), dtype=bool)
+    k = a.shape[1]
+    if k == 1:
+        return a[:, 0].min() <= b[:, 0]
+    if k == 2:
+        return _weakly_dominated(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+    if len(a) * len(b) <= BRUTE_FORCE_PAIRS:
+        return _dominated_brute_force(a, b, strict=False)
+    low, split = _split(a[:, 0])
+    dominated = np.zeros(len(b), dtype=bool)
+    if low is None:
+        # a is constant in the first column: rows of b at or above it are decided by the remaining columns
+        above = b[:, 0] >= split
+        dominated[above] = _filter(a[:, 1:], b[above, 1:])
+        return dominated
+
+    # b rows below the split can only be dominated by the lower rows of a, which also settle the first column of
+    # every b row at or above the split
+    b_low = b[:, 0] < split
+    dominated[b_low] = _filter(a[low], b[b_low])
+    high_rows = np.flatnonzero(~b_low)
+    b_high = b[high_rows]
+    high = _filter(a[low, 1:], b_high[:, 1:])
+    high[~high] = _filter(a[~low], b_high[~high])
+    dominated[high_rows] = high
+    return dominated
+
+
+def _split(values):
+    # (mask of the values below the split, split value), both sides non-empty; (None, value) for a constant column
+    smallest = values.min()
+    if smallest == values.max():
+        return None, smallest
+    split = np.partition(values, len(values) // 2)[len(values) // 2]
+    if split == smallest:
+        split = values[values > smallest].min()
+    return values < split, split
+
+
+def _dominated_brute_force(a, b, strict):
+    # True for the rows of b that some row of a is <= in every column (and < in at least one if strict)
+    dominated = np.zeros(len(b), dtype=bool)
+    step = max(1, BRUTE_FORCE_PAIRS // len(a))
+    for start in range(0, len(b), step):
+        block = b[start:start + step, None, :]
+        hit = np.all(a <= block, axis=2)
+        if strict:
+            hit &= np.any(a < block, axis=2)
+        dominated[start:start + step] = hit.any(axis=1)
+    return dominated
@@ -0,0 +1,114 @@
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+from models.model import MODEL_FIELDS
+from utils.vectorized import CHIP_SIZES, calculate_chip_area
+
+# Pipelined multi-chip deployment: every chip holds whole layers (weights, KV$ and activations) and the chips form a
+# pipeline, with the final linear layer (FLL) on the last chip. A stage holding n layers is sized by the area model of
+# calculate_chip_area applied to an n-layer slice of the model: weights and KV$ grow with n, activations and compute with
+# the min(n, users) layers in flight on the chip, and only the last stage carries the FLL weights, activations and FLOPs.
+# The transformer layers are identical, so a stage's area depends only on (n, holds FLL): both area curves are
+# tabulated once for n = 0..layers in one broadcast call, then
+#   minimum chips : greedy packing is optimal for contiguous stages, 1 + ceil((layers - FLL chip capacity) / capacity)
+#   stage balance : among minimum-chip layouts, the FLL chip layer count m minimising the largest stage area, the other
+#                   chips splitting the remaining layers evenly (an exact search over m, not a heuristic)
+# Everything broadcasts over users, input length, context length, hardware and ModelTable rows.
+
+Partition = namedtuple("Partition", ["num_chips", "body_layers", "head_layers", "bottleneck_area", "body_area", "head_area"])
+
+
+def stage_area(model, layers, head, users, input_len, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2,
+               w_res, act_res, kv_res=None, context_len=None):
+    # calculate_chip_area of a stage holding `layers` layers, plus the final linear layer where head is True
+    stage = SimpleNamespace(**{field: getattr(model, field) for field in MODEL_FIELDS})
+    stage.layers = layers
+    stage.vocab_size = np.where(head, model.vocab_size, 0)
+    return calculate_chip_area(stage, users, input_len, weight_density, weight_tiers, kv_density, act_density,
+                               tmacs_per_mm2, w_res, act_res, kv_res, context_len)
+
+
+def partition_layers(model, users, input_len, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2,
+                     w_res, act_res, kv_res=None, context_len=None, chip_size=CHIP_SIZES["reticle"]):
+    """
+    Minimum-chip contiguous layer-to-chip assignment and its best-balanced layout; every argument broadcasts.
+
+    Parameters:
+        model (LLMModel or ModelTable): Model(s) to partition.
+        users (int or array): Number of users.
+        input_len (float or array): Prefill input length.
+        weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res, kv_res: As in
+            calculate_chip_area.
+        context_len (int or array): AR context length; defaults to the model context length.
+        chip_size (float): Chip size in mm².
+
+    Returns:
+        Partition: num_chips is the minimum pipeline length (inf where a single layer, or the FLL chip, does not fit).
+            In the balanced layout the FLL chip holds head_layers layers and every other chip at most body_layers
+            layers (layer_assignment gives the ranges); bottleneck_area is the largest stage area in mm², body_area
+            and head_area the area of the largest other stage and of the FLL stage. Layer counts are -1 where
+            infeasible.
+    """
+    num_layers = np.asarray(model.layers)
+    n = np.arange(int(np.max(num_layers)) + 1)
+
+    def expand(value):
+        return value if value is None else np.asarray(value)[..., None]
+
+    # trailing axis: stage layer count n = 0..max layers
+    columns = SimpleNamespace(**{field: expand(getattr(model, field)) for field in MODEL_FIELDS})
+    args = [expand(value) for value in (users, input_len, weight_density, weight_tiers, kv_density, act_density,
+                                        tmacs_per_mm2, w_res, act_res, kv_res, context_len)]
+    body_area = stage_area(columns, n, False, *args)[0]
+    head_area = stage_area(columns, n, True, *args)[0]
+    body_area, head_area = np.broadcast_arrays(body_area, head_area)
+
+    # stage areas are non-decreasing in n, so the capacities are counts of the fitting entries
+    layers = num_layers[..., None]
+    in_range = n <= layers
+    body_capacity = np.count_nonzero((body_area <= chip_size) & in_range & (n >= 1), axis=-1)
+    head_capacity = np.count_nonzero((head_area <= chip_size) & in_range, axis=-1) - 1
+    rest = np.maximum(num_layers - head_capacity, 0)
+    feasible = (head_capacity >= 0) & ((body_capacity >= 1) | (rest == 0))
+    body_chips = np.where(feasible, -(-rest // np.maximum(body_capacity, 1)), 0)
+
+    # balance: the FLL chip takes m layers, the body_chips other chips ceil((layers - m) / body_chips) at most
+    m = n
+    remaining = layers - m
+    chips = body_chips[..., None]
+    per_chip = np.where(chips > 0, -(-np.maximum(remaining, 0) // np.maximum(chips, 1)), 0)
+    valid = in_range & (m <= head_capacity[..., None]) & (per_chip <= body_capacity[..., None]) & ((chips > 0) | (remaining == 0))
+    per_chip = np.minimum(per_chip, n[-1])
+    body = np.take_along_axis(body_area, per_chip, axis=-1)
+    bottleneck = np.where(valid, np.maximum(body, head_area), np.inf)
+    best = np.argmin(bottleneck, axis=-1)[..., None]
+
+    def pick(values):
+        return np.take_along_axis(values, best, axis=-1)[..., 0]
+
+    return Partition(
+        num_chips=np.where(feasible, body_chips + 1, np.inf),
+        body_layers=np.where(feasible, pick(per_chip), -1),
+        head_layers=np.where(feasible, best[..., 0], -1),
+        bottleneck_area=np.where(feasible, pick(bottleneck), np.inf),
+        body_area=np.where(feasible, pick(body), np.inf),
+        head_area=np.where(feasible, pick(head_area), np.inf),
+    )
+
+
+def layer_assignment(layers, num_chips, head_layers):
+    # [(first layer, last layer + 1), ...] per chip in pipeline order for one partition point; the last chip holds the FLL
+    layers, num_chips, head_layers = int(layers), int(num_chips), int(head_layers)
+    if num_chips < 1 or head_layers < 0:
+        raise ValueError("the model does not fit this chip size")
+    body_chips = num_chips - 1
+    base, extra = divmod(layers - head_layers, body_chips) if body_chips else (0, 0)
+    ranges, start = [], 0
+    for chip in range(body_chips):
+        stop = start + base + (chip < extra)
+        ranges.append((start, stop))
+        start = stop
+    ranges.append((start, layers))
+    return ranges
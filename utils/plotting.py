@@ -1,108 +1,148 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from utils.calculations import (
-    calculate_total_params,
-    calculate_total_KV_cache_size,
-    calculate_activations,
-    calculate_total_flops
-)
-
-def plot_model_chip_requirements(models, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res):
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+
+from models.table import ModelTable
+from utils.pareto import chip_requirement_front
+from utils.profiling import stage
+from utils.result_cache import cached_sweep
+from utils.vectorized import CHIP_SIZES, calculate_chip_area, calculate_num_chips, calculate_total_params
+
+# Above this many points a sweep is drawn as a 2D binned heatmap instead of a scatter
+MAX_SCATTER_POINTS = 20000
+
+def chip_requirements(models, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res, user_range=None, cache=None,
+                      kv_res=None):
+    """
+    Computes the chip requirement grid of plot_model_chip_requirements in one broadcast pass, or through a
+    utils.result_cache.ResultCache when one is given. Every combination of the w_res, kv_res and act_res values is
+    evaluated; kv_res defaults to the act_res values.
+
+    Returns:
+        dict: "model_size", "users", "w_res", "kv_res", "act_res", "total_area" and "num_reticle_chips" arrays,
+            flattened over models x users x w_res x kv_res x act_res.
     """
-    Plots the number of chips required for LLama 3.5T and 405B models (for now) based on compute and storage requirements. 
+    if not isinstance(models, ModelTable):
+        models = ModelTable.from_models(models)
+    if user_range is None:
+        user_range = np.arange(1, 257, 8)
+    kv_res = act_res if kv_res is None else kv_res
+
+    table = models.broadcast(4)
+    users = np.asarray(user_range)[None, :, None, None, None]
+    weight_res = np.asarray(w_res, dtype=np.float64)[None, None, :, None, None]
+    cache_res = np.asarray(kv_res, dtype=np.float64)[None, None, None, :, None]
+    activation_res = np.asarray(act_res, dtype=np.float64)[None, None, None, None, :]
+
+    model_size = calculate_total_params(table)[0]
+    if cache is None:
+        total_area = calculate_chip_area(table, users, table.context_len * 0.5, weight_density, weight_tiers, kv_density,
+                                         act_density, tmacs_per_mm2, weight_res, activation_res, cache_res)[0]
+    else:
+        # the cached grid is models x users x hardware axes, where only the three resolution axes have several values
+        hardware = {"weight_density": weight_density, "weight_tiers": weight_tiers, "kv_density": kv_density,
+                    "act_density": act_density, "tmacs_per_mm2": tmacs_per_mm2, "w_res": w_res, "act_res": act_res, "kv_res": kv_res}
+        total_area = cached_sweep(cache, models, hardware, users=user_range)["total_area"]
+        total_area = total_area.reshape(len(models), len(user_range), len(w_res), len(act_res), len(kv_res)).swapaxes(3, 4)
+    shape = total_area.shape
+    return {
+        "model_size": np.broadcast_to(model_size, shape).ravel(),
+        "users": np.broadcast_to(users, shape).ravel(),
+        "w_res": np.broadcast_to(weight_res, shape).ravel(),
+        "kv_res": np.broadcast_to(cache_res, shape).ravel(),
+        "act_res": np.broadcast_to(activation_res, shape).ravel(),
+        "total_area": total_area.ravel(),
+        "num_reticle_chips": calculate_num_chips(total_area, CHIP_SIZES["reticle"]).ravel(),
+    }
+
+def plot_model_chip_requirements(models, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res,
+                                 output_path="data/chip_requirements.png", show=False, max_scatter_points=MAX_SCATTER_POINTS, bins=(200, 128), cache=None,
+                                 pareto=False, user_range=None, kv_res=None):
+    """
+    Plots the number of chips required for LLama 3.5T and 405B models (for now) based on compute and storage requirements.
     Input contex length for prefill is assumed to be 1/2 of the model context length.
 
     Parameters:
-        models (list): List of LLMModel instances to analyze (for now LLama 3.5T and 405B).
+        models (list or ModelTable): LLMModel instances to analyze (for now LLama 3.5T and 405B).
         weight_density (float): Weight storage density in GB/mm².
         weight tiers (int): Number of tiers (layers) for weight memory.
         kv_density (float): KV$ storage density in GB/mm².
         act_density (float): Activation storage density in GB/mm².
         tmacs_per_mm2 (float): Compute density in TMACs/mm².
+        output_path (str): File the figure is written to (rendered headlessly with Agg).
+        show (bool): Also open an interactive window after saving.
+        max_scatter_points (int): Above this many points, draw a binned heatmap of the maximum chip count per bin.
+        bins (tuple): Heatmap bins along (model size, users).
+        cache (ResultCache): Optional on-disk result cache; only grid cells missing from it are computed.
+        pareto (bool): Overlay the Pareto frontier (fewest chips for the most users and the largest models).
+        user_range (array): Number of users axis; defaults to 1, 9, ..., 249.
+        kv_res (list): KV$ resolutions in bits; every (w_res, kv_res, act_res) combination is plotted. Defaults to act_res.
 
     Returns:
-        None: Displays the plot.
+        Figure: The rendered figure.
     """
-    # Chip sizes in mm²
-    chip_sizes = {"reticle": 800, "mobile": 80}
-    
-    # User and model size ranges
-    user_range = np.arange(1, 257, 8)
-    model_sizes = []
-
-    # Prepare data for plotting
-    data_points = []
-    
-    for model in models:
-        total_params, _, _ = calculate_total_params(model)
-        model_size = total_params
-        model_sizes.append(model_size)
-
-        for users in user_range:
-            # Calculate storage requirements
-            for weight_res, activation_res in zip(w_res, act_res):
-                kv_cache, _ = calculate_total_KV_cache_size(model, users=users)
-                act_storage, _, _ = calculate_activations(model, input_len=model.context_len * 0.5, users=users)
-                
-                weight_storage = (weight_res / 8) * total_params * (1 / weight_density) / weight_tiers  # mm²
-                kv_storage = (activation_res / 8) * kv_cache * (1 / kv_density)  # mm²
-                act_storage = (activation_res / 8) * act_storage * (1 / act_density)  # mm²
-
-                total_SRAM_storage_area = kv_storage + act_storage  # mm²
-                
-                # Calculate compute area
-                peak_flops, _, _ = calculate_total_flops(model, input_len=model.context_len * 0.5, users=users)
-                compute_area = 2 * peak_flops / 1000 / tmacs_per_mm2  # mm²
-
-                # Total chip area required. We assume LtRAM for weights is stacked on top of compute/SRAM which are layed in 2D.
-                total_area = max(total_SRAM_storage_area + compute_area, weight_storage)
-
-                # Calculate number of chips
-                num_reticle_chips = np.ceil(total_area / chip_sizes["reticle"])
-                #num_mobile_chips = np.ceil(total_area / chip_sizes["mobile"])
-                
-                # Append data for plotting
-                data_points.append({
-                    "model_size": model_size,
-                    "users": users,
-                    "total_area": total_area,
-                    "num_reticle_chips": num_reticle_chips
-                })
-
-    # Create the plot
-    fig, ax = plt.subplots(figsize=(14, 8))
+    with stage("plot.compute"):
+        data = chip_requirements(models, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res, user_range, cache, kv_res)
+    model_size, users, num_chips = data["model_size"], data["users"], data["num_reticle_chips"]
+    # the y-axis spans the users axis plus one user step of headroom
+    user_values = np.unique(users)
+    y_top = user_values[-1] + (np.diff(user_values).min() if len(user_values) > 1 else 1)
+
+    # Create the plot; batch runs render off-screen on an Agg canvas without touching pyplot
+    if show:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(14, 8))
+    else:
+        fig = Figure(figsize=(14, 8))
+        FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
 
     # custom colormap from cool to warm (blue to red)
-    cmap = plt.cm.get_cmap("coolwarm")
-    norm = plt.Normalize(1, max(dp['num_reticle_chips'] for dp in data_points))
-    
-    # Plot data points
-    scatter = None
-    for dp in data_points:
-        scatter = ax.scatter(dp['model_size'], dp['users'], c=[cmap(norm(dp['num_reticle_chips']))], s=35, edgecolors='k', alpha=0.8)
-        #ax.text(dp['model_size'], dp['users'], f"{int(dp['num_reticle_chips'])}", fontsize=16, ha='center', va='center', color='black')
-    
+    cmap = matplotlib.colormaps["coolwarm"]
+    norm = Normalize(1, num_chips.max())
+
+    if len(num_chips) <= max_scatter_points:
+        # Plot data points, one call for the whole series
+        ax.scatter(model_size, users, c=num_chips, cmap=cmap, norm=norm, s=35, edgecolors='k', alpha=0.8)
+    else:
+        # Dense sweep: maximum chip count per (model size, users) bin, drawn as one rasterized image
+        x_edges = np.linspace(model_size.min(), model_size.max() * 1.2, bins[0] + 1)
+        y_edges = np.linspace(0, y_top, bins[1] + 1)
+        x_bin = np.clip(np.searchsorted(x_edges, model_size, side="right") - 1, 0, bins[0] - 1)
+        y_bin = np.clip(np.searchsorted(y_edges, users, side="right") - 1, 0, bins[1] - 1)
+        grid = np.full(bins, np.nan)
+        np.fmax.at(grid, (x_bin, y_bin), num_chips)
+        ax.pcolormesh(x_edges, y_edges, grid.T, cmap=cmap, norm=norm, rasterized=True)
+
+    if pareto:
+        front = chip_requirement_front(data, maximize=("users", "model_size"), minimize=("num_reticle_chips",))
+        ax.scatter(model_size[front], users[front], s=90, facecolors='none', edgecolors='k', linewidths=1.5, label="Pareto frontier")
+        ax.legend(loc="upper right")
+
     # Colorbar setup
-    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-    sm.set_array([])
-    cbar = plt.colorbar(sm, ax=ax)
+    cbar = fig.colorbar(ScalarMappable(cmap=cmap, norm=norm), ax=ax)
     cbar.set_label("Number of Reticle Chips Required", rotation=270, labelpad=15)
 
     # X-axis settings
-    x_ticks = sorted(set(dp['model_size'] for dp in data_points))
-    x_labels = [f"{size: .1f} GB" for size in x_ticks]
-    ax.set_xticks(x_ticks)
-    ax.set_xticklabels(x_labels, rotation=90)  # Rotate x-axis labels
-    ax.set_xlim(left=min(x_ticks), right=max(x_ticks) * 1.2)  # Add padding on the right
+    x_ticks = np.unique(model_size)
+    if len(x_ticks) <= 50:
+        ax.set_xticks(x_ticks)
+        ax.set_xticklabels([f"{size: .1f} GB" for size in x_ticks], rotation=90)  # Rotate x-axis labels
+    ax.set_xlim(left=x_ticks.min(), right=x_ticks.max() * 1.2)  # Add padding on the right
 
     # Y-axis settings
-    ax.set_ylim(bottom=0, top=256)  # Extend to 128 users
-    # ax.yaxis.set_major_locator(plt.MultipleLocator(10))  # Tick every 10 users
+    ax.set_ylim(bottom=0, top=y_top)
     # Plot settings
     ax.set_xlabel("Model Size (Number of Parameters in Billions)")
     ax.set_ylabel("Number of Users")
     ax.set_title("Chip Requirements for LLama3 Models")
-#    ax.grid(True)
-    plt.tight_layout(pad=2)
-    plt.show()
-    plt.savefig("data/chip_requirements.png")
\ No newline at end of file
+    with stage("plot.savefig"):
+        fig.tight_layout(pad=2)
+        fig.savefig(output_path)
+
+    if show:
+        plt.show()
+    return fig
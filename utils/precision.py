@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from models.model import MODEL_FIELDS
+from models.table import ModelTable
+from utils.dse import DEFAULT_USERS
+from utils.vectorized import CHIP_SIZES, calculate_num_chips, calculate_storage_area, calculate_total_flops
+
+# Mixed-precision sweep: weights, KV$ and activations each get their own resolution axis, and the full cartesian
+# product models x users x context length x w_res x kv_res x act_res is evaluated in one broadcast pass. The resolutions
+# only scale the storage terms, so the FLOP, KV$ and activation counts are computed once on the (models, users,
+# context) grid and broadcast against the three trailing resolution axes.
+
+AXES = ("model", "users", "context_len", "w_res", "kv_res", "act_res")
+PRECISION_FIELDS = ("weight_area", "kv_area", "act_area", "sram_area", "compute_area", "total_area", "num_chips")
+
+
+def precision_sweep(models, w_res, kv_res, act_res, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2,
+                    users=DEFAULT_USERS, context_len=None, input_len=None, chip_size=CHIP_SIZES["reticle"]):
+    """
+    Storage area and chip count of every (w_res, kv_res, act_res) combination over models x users x context length.
+
+    Parameters:
+        models (ModelTable or list): Models to evaluate.
+        w_res, kv_res, act_res (list): Weight, KV$ and activation resolutions in bits.
+        weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2: As in calculate_chip_area.
+        users (array): Number of users axis.
+        context_len (array): Context lengths; each sizes both the AR context and the KV$ (max context length), as in
+            utils.solver. Defaults to each model's own context lengths (a context axis of length 1).
+        input_len (float): Prefill input length; defaults to half the context length.
+        chip_size (float): Chip size in mm².
+
+    Returns:
+        dict: PRECISION_FIELDS name -> array of shape (models, users, context, w_res, kv_res, act_res) in mm² (chips
+            for num_chips), plus the axis values under the AXES names ("model" holds the model names).
+    """
+    if not isinstance(models, ModelTable):
+        models = ModelTable.from_models(models)
+    users = np.asarray(users)
+    w_res, kv_res, act_res = (np.asarray(res, dtype=np.float64) for res in (w_res, kv_res, act_res))
+
+    # (models, users, context, w_res, kv_res, act_res)
+    model = models.broadcast(5)
+    grid_users = users[None, :, None, None, None, None]
+    if context_len is not None:
+        context = np.asarray(context_len)[None, None, :, None, None, None]
+        model = SimpleNamespace(**{field: getattr(model, field) for field in MODEL_FIELDS})
+        model.context_len = model.max_context_len = context
+    grid_input_len = model.context_len * 0.5 if input_len is None else input_len
+
+    weight_area, act_area, kv_area = calculate_storage_area(model, grid_users, grid_input_len, weight_density, weight_tiers, kv_density,
+                                                            act_density, w_res[:, None, None], act_res, kv_res[:, None])
+    peak_flops = calculate_total_flops(model, grid_input_len, grid_users)[0]
+    compute_area = 2 * peak_flops / 1000 / tmacs_per_mm2
+
+    # same composition as calculate_chip_area: LtRAM for weights is stacked on top of compute/SRAM
+    sram_area = kv_area + act_area
+    total_area = np.maximum(sram_area + compute_area, weight_area)
+
+    shape = np.broadcast_shapes(total_area.shape, (len(models), len(users), 1 if context_len is None else len(context_len),
+                                                   len(w_res), len(kv_res), len(act_res)))
+    fields = (weight_area, kv_area, act_area, sram_area, compute_area, total_area, calculate_num_chips(total_area, chip_size))
+    results = {name: np.broadcast_to(value, shape) for name, value in zip(PRECISION_FIELDS, fields)}
+    results.update(model=models.name, users=users, context_len=None if context_len is None else np.asarray(context_len),
+                   w_res=w_res, kv_res=kv_res, act_res=act_res)
+    return results
+
+
+def flatten(results):
+    # one flat array per field and per axis (model names, users, ...), in C order over the sweep grid
+    shape = results["total_area"].shape
+    index = np.unravel_index(np.arange(int(np.prod(shape))), shape)
+    flat = {name: np.ravel(results[name]) for name in PRECISION_FIELDS}
+    for name, axis_index in zip(AXES, index):
+        values = results[name]
+        flat[name] = np.full(len(axis_index), np.nan) if values is None else np.asarray(values)[axis_index]
+    return flat
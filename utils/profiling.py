@@ -0,0 +1,146 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Opt-in instrumentation of the analysis hot paths. Set WSE_PROFILE=1 (or call enable()) before the instrumented
+# modules are imported: when profiling is off, @instrument returns the function untouched and stage() returns a shared
+# no-op context manager, so disabled runs pay nothing per calculation call.
+#
+#   WSE_PROFILE=1                      per-function call counts / times and per-stage times, printed at exit
+#   WSE_PROFILE_OUTPUT=report.json     also write the report as JSON
+#   WSE_PROFILE_CPROFILE=run.prof      also dump a cProfile profile (snakeviz, gprof2dot, flameprof, ...)
+#   WSE_PROFILE_MEMORY=1               also trace allocations (tracemalloc, NumPy arrays included) for the peak memory
+#                                      each stage allocates; slows every allocation down, so timings are inflated
+# Without WSE_PROFILE_MEMORY a stage only records the process-wide peak RSS when it ends (ru_maxrss), which includes
+# everything allocated before the stage.
+
+ENABLED = False
+
+_functions = {}  # name -> [calls, seconds]
+_stages = {}     # name -> [calls, seconds, process peak RSS in MB at exit, peak traced MB allocated in the stage]
+_profiler = None
+_traced_peaks = []  # running traced-memory peak of every open stage, innermost last
+_start = time.perf_counter()
+_NO_STAGE = contextlib.nullcontext()
+
+
+def enable(output=None, cprofile_path=None, memory=False):
+    global ENABLED, _profiler
+    if ENABLED:
+        return
+    ENABLED = True
+    if memory:
+        tracemalloc.start()
+    if cprofile_path:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_finish, output, cprofile_path)
+
+
+def instrument(fn):
+    # call counter and inclusive timer for fn, keyed by module.qualname
+    if not ENABLED:
+        return fn
+    timer = _functions.setdefault(f"{fn.__module__}.{fn.__qualname__}", [0, 0.0])
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timer[0] += 1
+            timer[1] += time.perf_counter() - start
+    return wrapper
+
+
+def stage(name):
+    # with stage("load"): ... times a pipeline stage, samples the process peak RSS at its end and, when tracing memory,
+    # the peak memory allocated inside it
+    return _stage(name) if ENABLED else _NO_STAGE
+
+
+@contextlib.contextmanager
+def _stage(name):
+    record = _stages.setdefault(name, [0, 0.0, 0.0, None])
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # the peak counter is shared: fold it into the enclosing stage before resetting it for this one
+        baseline, peak = tracemalloc.get_traced_memory()
+        if _traced_peaks:
+            _traced_peaks[-1] = max(_traced_peaks[-1], peak)
+        tracemalloc.reset_peak()
+        _traced_peaks.append(baseline)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record[0] += 1
+        record[1] += time.perf_counter() - start
+        record[2] = max(record[2], peak_rss_mb())
+        if tracing:
+            stage_peak = max(_traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if _traced_peaks:
+                _traced_peaks[-1] = max(_traced_peaks[-1], stage_peak)
+            record[3] = max(record[3] or 0.0, (stage_peak - baseline) / 1024**2)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def report():
+    return {
+        "wall_seconds": time.perf_counter() - _start,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {name: {"calls": calls, "seconds": seconds, "process_peak_rss_mb": peak, "allocated_peak_mb": allocated}
+                   for name, (calls, seconds, peak, allocated) in _stages.items()},
+        "functions": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in _functions.items() if calls},
+    }
+
+
+def format_report(data=None):
+    data = data or report()
+    lines = [f"Profile: {data['wall_seconds']:.3f} s wall, peak RSS {data['peak_rss_mb']:.1f} MB"]
+    if data["stages"]:
+        # process peak RSS is process-wide (ru_maxrss) as of the stage end; allocated is the stage's own traced peak
+        lines.append(f"  {'stage':<44}{'calls':>10}{'seconds':>12}{'process peak RSS MB':>21}{'allocated MB':>14}")
+        for name, entry in data["stages"].items():
+            allocated = "-" if entry["allocated_peak_mb"] is None else f"{entry['allocated_peak_mb']:.1f}"
+            lines.append(f"  {name:<44}{entry['calls']:>10}{entry['seconds']:>12.4f}{entry['process_peak_rss_mb']:>21.1f}{allocated:>14}")
+    if data["functions"]:
+        lines.append(f"  {'function':<44}{'calls':>10}{'seconds':>12}{'us/call':>10}")
+        for name, entry in sorted(data["functions"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(f"  {name:<44}{entry['calls']:>10}{entry['seconds']:>12.4f}{entry['seconds'] / entry['calls'] * 1e6:>10.2f}")
+    return "\n".join(lines)
+
+
+def _finish(output, cprofile_path):
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(cprofile_path)
+    data = report()
+    print(format_report(data), file=sys.stderr)
+    if output:
+        with open(output, "w") as f:
+            json.dump(data, f, indent=1)
+
+
+if os.environ.get("WSE_PROFILE", "") not in ("", "0"):
+    enable(os.environ.get("WSE_PROFILE_OUTPUT"), os.environ.get("WSE_PROFILE_CPROFILE"),
+           os.environ.get("WSE_PROFILE_MEMORY", "") not in ("", "0"))
@@ -0,0 +1,257 @@
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import re
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
+
+from models.table import ModelTable
+from utils.dse import DEFAULT_USERS, HARDWARE_AXES, RESULT_FIELDS, expand_chunk, grid_shape, hardware_values
+from utils.vectorized import calculate_chip_area, calculate_num_chips
+
+# Persistent cache of chip-requirement results. A cell holds the RESULT_FIELDS results of one model spec at one hardware
+# point over an indexed users axis, stored as a raw float64 (1 + fields, users) array whose first row lists the users it
+# covers (headerless, so mapping a cell costs no header parse); the file is named by the SHA-256 of (model spec digest,
+# hardware point, input length rule). A request is answered from memory-mapped views of the cells, so a new model or a new users value only computes the cells or users
+# that are missing, and new users are merged into the existing cells. Cells live under a directory named after
+# CALC_VERSION, a hash of the formula sources, so editing utils/calculations.py or utils/vectorized.py invalidates every
+# earlier result. The cache directory may be shared with other data: only version directories carrying the cache's
+# marker file are ever removed.
+
+DEFAULT_CACHE_DIR = os.environ.get("WSE_CACHE_DIR", os.path.join("data", "cache"))
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+_FORMULA_SOURCES = ("calculations.py", "vectorized.py")
+_MARKER = ".result_cache"
+_VERSION_NAME = re.compile(r"[0-9a-f]{16}")
+
+
+def calculation_version():
+    digest = hashlib.sha256()
+    for source in _FORMULA_SOURCES:
+        with open(os.path.join(os.path.dirname(__file__), source), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+CALC_VERSION = calculation_version()
+
+
+class ResultCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, version=CALC_VERSION):
+        self.root = directory
+        self.directory = os.path.join(directory, version)
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._create()
+        self.invalidate_stale()
+
+    def key(self, model, hardware, input_len=None):
+        # model: the digest of one model spec (ModelTable.row_digests)
+        hardware = hardware_values(hardware)
+        payload = {"model": model, "hardware": [float(hardware[name]) for name in HARDWARE_AXES], "input_len": input_len}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".f8")
+
+    def load(self, key):
+        # the whole memory-mapped (1 + fields, users) cell, or None
+        try:
+            with open(self.path(key), "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: an empty file cannot be mapped
+            return None
+        rows = len(RESULT_FIELDS) + 1
+        if len(buffer) % (8 * rows):
+            return None
+        return np.frombuffer(buffer, dtype=np.float64).reshape(rows, -1)
+
+    def get(self, key, users):
+        # (fields, users) view of the cell, or None when it is missing or lacks some of the users
+        cell = self.load(key)
+        block = None if cell is None else _select_users(cell, users)
+        if block is None:
+            self.misses += 1
+            return None
+        # the modification time doubles as the last-use time for LRU eviction
+        os.utime(self.path(key))
+        self.hits += 1
+        return block
+
+    def put(self, key, users, block):
+        # merges the (fields, users) block into the cell and returns the merged cell
+        users = np.asarray(users, dtype=np.float64)
+        cell = self.load(key)
+        if cell is not None:
+            keep = ~np.isin(cell[0], users)
+            users = np.concatenate([cell[0][keep], users])
+            block = np.concatenate([cell[1:, keep], block], axis=1)
+        users, first = np.unique(users, return_index=True)
+        cell = np.vstack([users[None, :], block[:, first]])
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        cell.tofile(tmp_path)
+        os.replace(tmp_path, path)
+        return cell
+
+    def size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self):
+        # drop least recently used cells until the cache fits max_bytes
+        entries = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # evicted concurrently by another sweep worker
+                pass
+            total -= size
+
+    def invalidate_stale(self):
+        # remove results computed by other versions of the formulas, leaving anything the cache did not create
+        for entry in os.scandir(self.root):
+            if (entry.is_dir(follow_symlinks=False) and entry.name != self.version and _VERSION_NAME.fullmatch(entry.name)
+                    and os.path.isfile(os.path.join(entry.path, _MARKER))):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._create()
+
+    def _create(self):
+        os.makedirs(self.directory, exist_ok=True)
+        marker = os.path.join(self.directory, _MARKER)
+        if not os.path.exists(marker):
+            with open(marker, "w") as f:
+                f.write(self.version + "\n")
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                yield from (entry for entry in os.scandir(shard.path) if entry.name.endswith(".f8"))
+
+
+class CachedGrid(Mapping):
+    """
+    RESULT_FIELDS name -> array of shape (models, users, *hardware axes), the grid layout of utils/dse.py. The cells
+    stay memory-mapped views until a field is first read; only that field is then stacked.
+    """
+
+    def __init__(self, cells, shape):
+        self._cells = cells
+        self._shape = shape
+        self._fields = {}
+
+    def __getitem__(self, field):
+        if field not in self._fields:
+            if field not in RESULT_FIELDS:
+                raise KeyError(field)
+            f = RESULT_FIELDS.index(field)
+            num_models, num_points = self._cells.shape
+            grid = np.empty((num_models, self._shape[1], num_points))
+            for m in range(num_models):
+                for h in range(num_points):
+                    grid[m, :, h] = self._cells[m, h][f]
+            self._fields[field] = grid.reshape(self._shape)
+        return self._fields[field]
+
+    def __iter__(self):
+        return iter(RESULT_FIELDS)
+
+    def __len__(self):
+        return len(RESULT_FIELDS)
+
+
+def cached_sweep(cache, models, axes, users=DEFAULT_USERS, input_len=None, evict=True):
+    """
+    Chip requirements over models x users x every hardware axis, computing only the cells and users missing from the cache.
+
+    Parameters:
+        cache (ResultCache): Cache to read from and fill.
+        models (ModelTable or list): Models to evaluate.
+        axes (dict): Values for every name in HARDWARE_AXES; kv_res defaults to act_res.
+        users (array): Number of users axis.
+        input_len (float): Prefill input length; defaults to half of each model's context length.
+        evict (bool): Trim the cache to its size limit after writing new cells.
+
+    Returns:
+        CachedGrid: RESULT_FIELDS name -> array of shape (models, users, *hardware axes), the grid layout of utils/dse.py.
+    """
+    if not isinstance(models, ModelTable):
+        models = ModelTable.from_models(models)
+    users = np.asarray(users)
+    axes = {name: np.atleast_1d(values).tolist() for name, values in hardware_values(axes).items()}
+    points = list(itertools.product(*(axes[name] for name in HARDWARE_AXES)))
+    digests = models.row_digests()
+
+    cells = np.empty((len(models), len(points)), dtype=object)
+    missing = {}
+    for m, digest in enumerate(digests):
+        for h, point in enumerate(points):
+            key = cache.key(digest, dict(zip(HARDWARE_AXES, point)), input_len)
+            block = cache.get(key, users)
+            if block is None:
+                missing[m, h] = key
+            else:
+                cells[m, h] = block
+
+    if missing:
+        # evaluate the missing users of every model and hardware point with a stale cell in one broadcast pass:
+        # (models, 1, 1) x (1, users, 1) x (1, 1, points)
+        stale_models = sorted({m for m, _ in missing})
+        stale_points = sorted({h for _, h in missing})
+        new_users = np.unique(np.concatenate([_missing_users(cache.load(key), users) for key in missing.values()]))
+        table = models.take(stale_models).broadcast(2)
+        hardware = np.asarray(points, dtype=np.float64)[stale_points].T[:, None, None, :]
+        grid_input_len = table.context_len * 0.5 if input_len is None else input_len
+        total_area, weight_area, sram_area, compute_area = calculate_chip_area(table, new_users[None, :, None], grid_input_len, *hardware)
+        blocks = np.stack(np.broadcast_arrays(total_area, weight_area, sram_area, compute_area, calculate_num_chips(total_area)))
+        for (m, h), key in missing.items():
+            cell = cache.put(key, new_users, blocks[:, stale_models.index(m), :, stale_points.index(h)])
+            cells[m, h] = _select_users(cell, users)
+        if evict:
+            cache.evict()
+
+    return CachedGrid(cells, grid_shape(models, users, axes))
+
+
+def cached_chunk(cache, models, users, axes, start, stop, input_len=None):
+    # utils/dse.py evaluate_chunk served from the cache: the models a chunk touches are looked up (and filled) whole
+    model_index, values = expand_chunk(models, users, axes, start, stop)
+    first, last = int(model_index[0]), int(model_index[-1]) + 1
+    grid = cached_sweep(cache, models[first:last], axes, users, input_len, evict=False)
+    index = np.arange(start, stop, dtype=np.int64) - first * int(np.prod(grid_shape(models, users, axes)[1:]))
+    results = {field: grid[field].reshape(-1)[index] for field in RESULT_FIELDS}
+    return model_index, values, results
+
+
+def _select_users(cell, users):
+    # (fields, users) view of a cell (users sorted in its first row), or None if some users are not cached; a run of
+    # consecutive cached users is a plain slice, so a memory-mapped cell stays memory-mapped
+    cached = cell[0]
+    if len(cached) == 0:
+        return None
+    index = np.minimum(np.searchsorted(cached, users), len(cached) - 1)
+    if np.any(cached[index] != users):
+        return None
+    if len(index) and np.all(np.diff(index) == 1):
+        return cell[1:, index[0]:index[-1] + 1]
+    return cell[1:, index]
+
+
+def _missing_users(cell, users):
+    return np.asarray(users, dtype=np.float64) if cell is None else np.setdiff1d(np.asarray(users, dtype=np.float64), cell[0])
@@ -0,0 +1,102 @@
+import numpy as np
+
+from utils.vectorized import calculate_chip_area, calculate_total_flops, calculate_total_mem_transfer
+
+# Roofline timing on top of the FLOP and memory transfer breakdowns. calculations.py counts the work of one pipeline
+# step, in which min(layers, users) layers run concurrently, each processing one user and reading its own weights, and
+# the final linear layer (FLL) runs once. Evaluated at users = layers, that is exactly one pass of one token (or one
+# prompt) through every layer and the FLL: each weight is read once and the FLL charged once. A pass takes
+# max(compute time, LtRAM time for weights, StRAM time for activations + KV$), since the compute array and the two
+# memories work in parallel, and the users in flight share them, so:
+#   time to first token    = prefill pass time
+#   aggregate tokens/s     = 1 / AR pass time
+#   tokens/s per user      = aggregate tokens/s / users
+
+BOUNDS = ("compute", "ltram", "stram")
+
+
+def peak_gflops(tmacs_per_mm2, compute_area):
+    # TMACs/mm² x mm² -> GFLOP/s (2 FLOPs per MAC)
+    return 2 * tmacs_per_mm2 * compute_area * 1000
+
+
+def pass_work(model, input_len, context_len=None):
+    # GFLOPs and [weights, activations, KV$] G transfers of one prefill and one AR pass through all layers and the FLL
+    _, prefill_flops, AR_flops = calculate_total_flops(model, input_len, model.layers, context_len)
+    prefill_mem, AR_mem = calculate_total_mem_transfer(model, input_len, model.layers, context_len)
+    return prefill_flops[1], AR_flops[1], prefill_mem, AR_mem
+
+
+def stage_times(flops, mem_transfer, ltram_bw, stram_bw, peak, w_res=8, act_res=8, kv_res=None):
+    # flops in G, mem_transfer = [weights, activations, KV$] in G elements, bandwidths in GB/s, peak in GFLOP/s
+    kv_res = act_res if kv_res is None else kv_res
+    weights, activations, kv = mem_transfer
+    compute_time = flops / peak
+    ltram_time = weights * (w_res / 8) / ltram_bw
+    stram_time = (activations * (act_res / 8) + kv * (kv_res / 8)) / stram_bw
+    times = np.stack(np.broadcast_arrays(compute_time, ltram_time, stram_time))
+    return times.max(axis=0), times.argmax(axis=0)
+
+
+def calculate_latency(model, input_len, users, ltram_bw, stram_bw, tmacs_per_mm2, compute_area, w_res=8, act_res=8, kv_res=None, context_len=None):
+    """
+    Roofline latency and throughput; every argument broadcasts (users and context_len sweeps in particular).
+
+    Parameters:
+        model (LLMModel or ModelTable): Model(s) to evaluate.
+        input_len (float): Prefill input length (I).
+        users (int or array): Number of users.
+        ltram_bw (float): LtRAM (weight memory) bandwidth in GB/s.
+        stram_bw (float): StRAM (activation and KV$ memory) bandwidth in GB/s.
+        tmacs_per_mm2 (float): Compute density in TMACs/mm².
+        compute_area (float): Compute area in mm², e.g. the compute area returned by calculate_chip_area.
+        w_res, act_res, kv_res (int): Weight, activation and KV$ resolution in bits (kv_res defaults to act_res).
+        context_len (int or array): AR context length; defaults to the model context length.
+
+    Returns:
+        dict: "prefill_time" and "AR_time" (s per pass through the model of one prompt and one token),
+            "prefill_bound" and "AR_bound" (index into BOUNDS), "ttft" (s), "tokens_per_s" (aggregate) and
+            "tokens_per_s_per_user".
+    """
+    peak = peak_gflops(tmacs_per_mm2, compute_area)
+    prefill_flops, AR_flops, prefill_mem, AR_mem = pass_work(model, input_len, context_len)
+
+    prefill_time, prefill_bound = stage_times(prefill_flops, prefill_mem, ltram_bw, stram_bw, peak, w_res, act_res, kv_res)
+    AR_time, AR_bound = stage_times(AR_flops, AR_mem, ltram_bw, stram_bw, peak, w_res, act_res, kv_res)
+
+    tokens_per_s = 1 / AR_time
+    return {
+        "prefill_time": prefill_time,
+        "prefill_bound": prefill_bound,
+        "AR_time": AR_time,
+        "AR_bound": AR_bound,
+        "ttft": prefill_time,
+        "tokens_per_s": tokens_per_s,
+        "tokens_per_s_per_user": tokens_per_s / users,
+    }
+
+
+def chip_latency(model, input_len, users, ltram_bw, stram_bw, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2,
+                 w_res=8, act_res=8, kv_res=None, context_len=None):
+    # roofline timing of the chip sized by the area model (compute area from calculate_chip_area)
+    compute_area = calculate_chip_area(model, users, input_len, weight_density, weight_tiers, kv_density, act_density,
+                                       tmacs_per_mm2, w_res, act_res, kv_res, context_len)[3]
+    return calculate_latency(model, input_len, users, ltram_bw, stram_bw, tmacs_per_mm2, compute_area, w_res, act_res, kv_res,
+                             context_len)
+
+
+def compute_area_for_throughput(model, input_len, users, tokens_per_s_per_user, ltram_bw, stram_bw, tmacs_per_mm2,
+                                w_res=8, act_res=8, kv_res=None, context_len=None):
+    """
+    Smallest compute area (mm²) that sustains a per-user AR token rate; inf where the memory bandwidths alone
+    cannot reach it.
+    """
+    _, AR_flops, _, AR_mem = pass_work(model, input_len, context_len)
+
+    # AR pass time needed for the target: tokens/s per user = 1 / users / pass time
+    pass_time = 1 / (users * tokens_per_s_per_user)
+    kv_res = act_res if kv_res is None else kv_res
+    memory_time = np.maximum(AR_mem[0] * (w_res / 8) / ltram_bw,
+                             (AR_mem[1] * (act_res / 8) + AR_mem[2] * (kv_res / 8)) / stram_bw)
+    area = AR_flops / pass_time / (2 * tmacs_per_mm2 * 1000)
+    return np.where(memory_time <= pass_time, area, np.inf)
@@ -0,0 +1,102 @@
+import math
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+from models.model import MODEL_FIELDS
+from utils.dse import HARDWARE_AXES, hardware_values
+from utils.vectorized import CHIP_SIZES, calculate_chip_area
+
+# Inverse of the chip area model: the largest number of users, prefill input length or context length that fits a
+# chip or area budget. The weight area does not depend on any of these and the SRAM + compute area is non-decreasing in
+# all of them, so the answer is found by a k-ary search over the integers: every round evaluates SEARCH_POINTS
+# candidates in one vectorized call, narrowing a 2^53 bracket to the exact answer in under ten rounds.
+
+SolveResult = namedtuple("SolveResult", ["value", "binding", "total_area", "weight_area", "sram_compute_area"])
+
+SEARCH_POINTS = 64
+MAX_VALUE = 2**53  # largest integer the float area model represents exactly
+
+
+def max_users(model, hardware, chips=None, area=None, input_len=None, chip_size=CHIP_SIZES["reticle"]):
+    return solve_max(model, "users", hardware, chips, area, input_len=input_len, chip_size=chip_size)
+
+
+def max_input_len(model, hardware, chips=None, area=None, users=1, chip_size=CHIP_SIZES["reticle"]):
+    return solve_max(model, "input_len", hardware, chips, area, users=users, chip_size=chip_size)
+
+
+def max_context_len(model, hardware, chips=None, area=None, users=1, input_len=None, chip_size=CHIP_SIZES["reticle"]):
+    return solve_max(model, "context_len", hardware, chips, area, users=users, input_len=input_len, chip_size=chip_size)
+
+
+def solve_max(model, variable, hardware, chips=None, area=None, users=1, input_len=None, chip_size=CHIP_SIZES["reticle"]):
+    """
+    Finds the largest integer value of one workload variable whose chip area fits a budget.
+
+    Parameters:
+        model (LLMModel): Model to size.
+        variable (str): "users", "input_len" or "context_len". Solving for context_len sizes both the AR context and
+            the KV$ (max context length) to the same value.
+        hardware (dict): Value for every name in HARDWARE_AXES (weight_density, weight_tiers, kv_density, act_density,
+            tmacs_per_mm2, w_res, act_res, kv_res); kv_res defaults to act_res.
+        chips (int): Chip budget; the area budget is chips * chip_size.
+        area (float): Area budget in mm², used when chips is not given.
+        users (int): Number of users when solving for input_len or context_len.
+        input_len (float): Prefill input length; defaults to half the model context length, as in plot_model_chip_requirements.
+        chip_size (float): Chip size in mm².
+
+    Returns:
+        SolveResult: value is the maximum that fits (0 if even 1 does not fit, math.inf if the area stops growing
+            below the budget). binding is "weight" when the weight (LtRAM) area alone exceeds the budget,
+            "sram_compute" when the KV$ + activation + compute area caps the value and None when unbounded.
+            The areas are evaluated at the returned value (at 1 when nothing fits, at MAX_VALUE when unbounded).
+    """
+    if variable not in ("users", "input_len", "context_len"):
+        raise ValueError(f"unknown variable {variable!r}; expected users, input_len or context_len")
+    if chips is not None:
+        area = chips * chip_size
+    if area is None:
+        raise ValueError("a chip or area budget is required")
+    hardware = hardware_values(hardware)
+
+    def areas(values):
+        values = np.asarray(values, dtype=np.float64)
+        m, u, i, c = model, users, input_len, None
+        if variable == "users":
+            u = values
+        elif variable == "input_len":
+            i = values
+        else:
+            m = SimpleNamespace(**{field: getattr(model, field) for field in MODEL_FIELDS})
+            m.context_len = m.max_context_len = c = values
+        if i is None:
+            i = m.context_len * 0.5
+        total, weight, sram, compute = calculate_chip_area(m, u, i, *(hardware[name] for name in HARDWARE_AXES), context_len=c)
+        return total, weight, sram + compute
+
+    def result(value, binding):
+        total, weight, sram_compute = areas(min(max(value, 1), MAX_VALUE))
+        return SolveResult(value, binding, float(total), float(weight), float(sram_compute))
+
+    total, weight, sram_compute = areas(1)
+    if weight > area:
+        return SolveResult(0, "weight", float(total), float(weight), float(sram_compute))
+    if total > area:
+        return SolveResult(0, "sram_compute", float(total), float(weight), float(sram_compute))
+    if areas(MAX_VALUE)[0] <= area:
+        return result(math.inf, None)
+
+    # invariant: lo fits the budget, hi does not
+    lo, hi = 1, MAX_VALUE
+    while hi - lo > 1:
+        candidates = np.unique(np.linspace(lo, hi, SEARCH_POINTS + 1).astype(np.int64))[1:-1]
+        fits = areas(candidates)[0] <= area
+        # fits is monotone (True then False) over the sorted candidates
+        n_fit = int(np.count_nonzero(fits))
+        if n_fit:
+            lo = int(candidates[n_fit - 1])
+        if n_fit < len(candidates):
+            hi = int(candidates[n_fit])
+    return result(lo, "sram_compute")
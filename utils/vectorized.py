@@ -0,0 +1,284 @@
+import numpy as np
+
+from models.table import ModelTable
+from utils.profiling import instrument
+
+# Array versions of the cost functions in utils/calculations.py. Every argument (users, input_len, context_len and every
+# model field) may be a scalar or a NumPy array; the results broadcast together under the normal NumPy rules.
+# The formulas are kept term-for-term identical to the scalar versions (same operation order) so results match exactly.
+
+# Chip sizes in mm²
+CHIP_SIZES = {"reticle": 800, "mobile": 80}
+
+
+def stack_models(models, ndim=1):
+    """
+    Stacks a list of LLMModel instances into a ModelTable whose columns broadcast against sweep axes.
+
+    Parameters:
+        models (list): List of LLMModel instances.
+        ndim (int): Number of trailing broadcast axes to add after the model axis, e.g. ndim=1 gives (M, 1) columns
+            that broadcast against a 1-D users or input_len array.
+
+    Returns:
+        ModelTable: Table exposing the same attributes as LLMModel, one array per field.
+    """
+    return ModelTable.from_models(models).broadcast(ndim)
+
+
+def _as_float(value):
+    # sweep variables are multiplied together (e.g. input_len² x users x layers), which wraps around in int64
+    return np.asarray(value, dtype=np.float64)
+
+
+def _context_len(model, context_len):
+    return _as_float(model.context_len if context_len is None else context_len)
+
+
+@instrument
+def calculate_total_params(model):
+    # per layer Wo / Wq
+    w_o = (model.num_attention_heads * model.head_dim)**2
+    w_q = (model.num_attention_heads * model.head_dim)**2
+
+    # per layer Wk / Wv
+    w_k = (model.num_attention_heads * model.head_dim) * model.head_dim * model.num_kv_heads
+    w_v = (model.num_attention_heads * model.head_dim) * model.head_dim * model.num_kv_heads
+
+    # per layer Wffn
+    w_ffn = model.ffn_layers * model.ffn_dim * model.emb_dim
+
+    # per layer total weights
+    w_tot_layer = w_o + w_q + w_k + w_v + w_ffn
+
+    # linear layer weights
+    w_ll = model.emb_dim * model.vocab_size
+
+    # total weights for all layers
+    total_weights = w_tot_layer * model.layers + w_ll
+
+    per_layer_weights = [w_ll, w_o, w_q, w_k, w_v, w_ffn]
+
+    return np.divide(total_weights, 1000**3), np.divide(w_tot_layer, 1000**3), [np.divide(value, 1000**3) for value in per_layer_weights]
+
+
+@instrument
+def calculate_total_KV_cache_size(model, users):
+    users = _as_float(users)
+
+    # per layer K/V cache
+    kv_cache = 2 * model.num_kv_heads * model.head_dim * model.max_context_len * users
+
+    # total K/V cache for all layers
+    total_kv_cache = kv_cache * model.layers
+
+    return total_kv_cache/1000**3, kv_cache/1000**3
+
+
+@instrument
+def calculate_activations(model, input_len, users, context_len=None):
+    input_len, users = _as_float(input_len), _as_float(users)
+    context_len = _context_len(model, context_len)
+    concurrent_layers = np.minimum(model.layers, users)
+
+    # per input/output activations
+    in_out_prefill = 2 * input_len * model.emb_dim
+    in_out_AR = 2 * 1 * model.emb_dim
+
+    # per layer query activations; Query (Q) = XWq
+    query_prefill = input_len * model.num_attention_heads * model.head_dim
+    query_AR = 1 * model.num_attention_heads * model.head_dim
+
+    # per layer attention matrix activations; qkT = QK^T
+    qkT_prefill = input_len * input_len * model.num_attention_heads
+    qkT_AR = 1 * context_len * model.num_attention_heads
+
+    # qkTV = (QK^T)V
+    qkTV_prefill = input_len * model.head_dim * model.num_attention_heads
+    qkTV_AR = 1 * model.head_dim * model.num_attention_heads
+
+    # O = Concat(qkTV)Wo
+    o_prefill = input_len * model.emb_dim
+    o_AR = 1 * model.emb_dim
+
+    # FFN activations; FFN = (Swish(OW1) + OW2)W3 for LLama Models
+    ffn_prefill = (model.ffn_layers - 1) * input_len * model.ffn_dim + input_len * model.emb_dim
+    ffn_AR = (model.ffn_layers - 1) * 1 * model.ffn_dim + model.emb_dim
+
+    # FLL activations
+    fll_prefill = input_len * model.vocab_size
+    fll_AR = 1 * model.vocab_size
+
+    # maximum total activations for all layers
+    max_total_activations = (np.maximum(in_out_prefill, in_out_AR) + np.maximum(query_prefill, query_AR) + np.maximum(qkT_prefill, qkT_AR)
+                             + np.maximum(qkTV_prefill, qkTV_AR) + np.maximum(o_prefill, o_AR) + np.maximum(ffn_prefill, ffn_AR))
+    max_total_activations = max_total_activations * concurrent_layers + np.maximum(fll_prefill, fll_AR)
+
+    total_activations_prefill = in_out_prefill + query_prefill + qkT_prefill + qkTV_prefill + o_prefill + ffn_prefill
+    total_activations_prefill = total_activations_prefill * concurrent_layers + fll_prefill
+
+    total_activations_AR = in_out_AR + query_AR + qkT_AR + qkTV_AR + o_AR + ffn_AR
+    total_activations_AR = total_activations_AR * concurrent_layers + fll_AR
+
+    return max_total_activations/1000**3, total_activations_prefill/1000**3, total_activations_AR/1000**3
+
+
+@instrument
+def calculate_total_flops(model, input_len, users, context_len=None):
+    input_len, users = _as_float(input_len), _as_float(users)
+    context_len = _context_len(model, context_len)
+    concurrent_layers = np.minimum(model.layers, users)
+
+    # Q = XWq
+    q_flops_prefill = 2 * model.emb_dim * model.num_attention_heads * model.head_dim * input_len
+    q_flops_AR = 2 * model.emb_dim * model.num_attention_heads * model.head_dim
+
+    # K/V = XWk/XWv
+    kv_flops_prefill = 2 * 2 * model.emb_dim * model.head_dim * model.num_kv_heads * input_len
+    kv_flops_AR = 2 * 2 * model.emb_dim * model.head_dim * model.num_kv_heads
+
+    # QK^T
+    qkT_flops_prefill = 2 * model.head_dim * input_len * input_len * model.num_attention_heads
+    qkT_flops_AR = 2 * model.head_dim * context_len * model.num_attention_heads
+
+    # QK^TV
+    qkTV_flops_prefill = 2 * input_len * model.head_dim * input_len * model.num_attention_heads
+    qkTV_flops_AR = 2 * context_len * model.head_dim * 1 * model.num_attention_heads
+
+    # O = Concat(qkTV)Wo
+    o_flops_prefill = 2 * model.emb_dim * model.emb_dim * input_len
+    o_flops_AR = 2 * model.emb_dim * model.emb_dim
+
+    # FFN = (Swish(OW1) + OW2)W3
+    ffn_flops_prefill = 2 * model.ffn_layers * model.emb_dim * input_len * model.ffn_dim
+    ffn_flops_AR = 2 * model.ffn_layers * model.emb_dim * model.ffn_dim
+
+    # FLL = O x WLL
+    fll_flops_prefill = 2 * model.emb_dim * model.vocab_size * input_len
+    fll_flops_AR = 2 * model.emb_dim * model.vocab_size
+
+    # total FLOPs for all layers
+    total_flops_prefill = concurrent_layers * (q_flops_prefill + kv_flops_prefill + qkT_flops_prefill + qkTV_flops_prefill + o_flops_prefill + ffn_flops_prefill) + fll_flops_prefill
+    total_flops_AR = concurrent_layers * (q_flops_AR + kv_flops_AR + qkT_flops_AR + qkTV_flops_AR + o_flops_AR + ffn_flops_AR) + fll_flops_AR
+
+    prefill_flops_breakdown = [concurrent_layers * (q_flops_prefill + kv_flops_prefill + o_flops_prefill + ffn_flops_prefill) + fll_flops_prefill,
+                               total_flops_prefill,
+                               concurrent_layers * (qkT_flops_prefill + qkTV_flops_prefill + kv_flops_prefill)]
+
+    AR_flops_breakdown = [concurrent_layers * (q_flops_AR + kv_flops_AR + o_flops_AR + ffn_flops_AR) + fll_flops_AR,
+                          total_flops_AR,
+                          concurrent_layers * (qkT_flops_AR + qkTV_flops_AR + kv_flops_AR)]
+
+    return np.maximum(total_flops_prefill, total_flops_AR)/1000**3, [value/1000**3 for value in prefill_flops_breakdown], [value/1000**3 for value in AR_flops_breakdown]
+
+
+@instrument
+def calculate_total_mem_transfer(model, input_len, users, context_len=None):
+    input_len, users = _as_float(input_len), _as_float(users)
+    context_len = _context_len(model, context_len)
+    concurrent_layers = np.minimum(model.layers, users)
+
+    weight_mem_transfer = calculate_total_params(model)[0]*1000**3
+
+    # Q = XWq; read X once from act. mem and write each Q to act. mem.
+    q_act_mem_transfer_prefill = input_len * model.emb_dim + (input_len * model.head_dim) * model.num_attention_heads
+    q_act_mem_transfer_AR = 1 * model.emb_dim + (1 * model.head_dim) * model.num_attention_heads
+
+    # K/V = XWk/XWv; write K/V to KV$.
+    kv_cache_mem_transfer_prefill = 2 * (input_len * model.head_dim) * model.num_kv_heads
+    kv_cache_mem_transfer_AR = 2 * (1 * model.head_dim) * model.num_kv_heads
+
+    # QK^T; read Q from act. mem and K from KV$ and write result to act. mem.
+    qkT_act_mem_transfer_prefill = (input_len * model.head_dim + input_len * input_len) * model.num_attention_heads
+    qkT_cache_mem_transfer_prefill = (input_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
+
+    qkT_act_mem_transfer_AR = (1 * model.head_dim + 1 * context_len) * model.num_attention_heads
+    qkT_cache_mem_transfer_AR = (context_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
+
+    # QK^TV; read QK^T from act. mem and V from KV$ and write result to act. mem.
+    qkTV_act_mem_transfer_prefill = (input_len * input_len + input_len * model.head_dim) * model.num_attention_heads
+    qkTV_cache_mem_transfer_prefill = (input_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
+
+    qkTV_act_mem_transfer_AR = (1 * context_len + 1 * model.head_dim) * model.num_attention_heads
+    qkTV_cache_mem_transfer_AR = (context_len * model.head_dim * model.num_kv_heads / model.num_attention_heads) * model.num_attention_heads
+
+    # O = Concat(qkTV)Wo
+    o_act_mem_transfer_prefill = input_len * model.head_dim * model.num_attention_heads + input_len * model.emb_dim
+    o_act_mem_transfer_AR = 1 * model.head_dim * model.num_attention_heads + model.emb_dim
+
+    # FFN = (Swish(OW1) + OW2)W3
+    ffn_act_mem_transfer_prefill = input_len * model.emb_dim + 2 * (model.ffn_layers - 1) * input_len * model.ffn_dim + input_len * model.emb_dim
+    ffn_act_mem_transfer_AR = 1 * model.emb_dim + 2 * (model.ffn_layers - 1) * 1 * model.ffn_dim + model.emb_dim
+
+    # FLL = O x WLL
+    fll_act_mem_transfer_prefill = input_len * model.emb_dim + input_len * model.vocab_size
+    fll_act_mem_transfer_AR = 1 * model.emb_dim + 1 * model.vocab_size
+
+    # total memory transfer for all layers
+    total_act_mem_transfer_prefill = (q_act_mem_transfer_prefill + qkT_act_mem_transfer_prefill + qkTV_act_mem_transfer_prefill + o_act_mem_transfer_prefill +
+                                      ffn_act_mem_transfer_prefill) * concurrent_layers + fll_act_mem_transfer_prefill
+
+    total_act_mem_transfer_AR = (q_act_mem_transfer_AR + qkT_act_mem_transfer_AR + qkTV_act_mem_transfer_AR + o_act_mem_transfer_AR +
+                                 ffn_act_mem_transfer_AR) * concurrent_layers + fll_act_mem_transfer_AR
+
+    total_kv_mem_transfer_prefill = (kv_cache_mem_transfer_prefill + qkT_cache_mem_transfer_prefill + qkTV_cache_mem_transfer_prefill) * concurrent_layers
+    total_kv_mem_transfer_AR = (kv_cache_mem_transfer_AR + qkT_cache_mem_transfer_AR + qkTV_cache_mem_transfer_AR) * concurrent_layers
+
+    prefill_mem_transfer_breakdown = [weight_mem_transfer, total_act_mem_transfer_prefill, total_kv_mem_transfer_prefill]
+    AR_mem_transfer_breakdown = [weight_mem_transfer, total_act_mem_transfer_AR, total_kv_mem_transfer_AR]
+
+    return [value/1000**3 for value in prefill_mem_transfer_breakdown], [value/1000**3 for value in AR_mem_transfer_breakdown]
+
+
+@instrument
+def calculate_storage(model, w_res, act_res, input_len, users, kv_res=None, context_len=None):
+    # weight storage, activation storage and KV$ storage in GB; kv_res defaults to act_res
+    kv_res = act_res if kv_res is None else kv_res
+    total_weights, total_kv_cache, total_activations = calculate_total_params(model)[0], calculate_total_KV_cache_size(model, users)[0], calculate_activations(model, input_len, users, context_len)[0]
+    weight_storage = total_weights * (w_res / 8)
+
+    kv_storage = total_kv_cache * (kv_res / 8)
+
+    act_storage = total_activations * (act_res / 8)
+
+    return weight_storage, act_storage, kv_storage
+
+
+@instrument
+def calculate_storage_area(model, users, input_len, weight_density, weight_tiers, kv_density, act_density, w_res, act_res, kv_res=None, context_len=None):
+    # weight (LtRAM), activation and KV$ storage area in mm² (the order of calculate_storage) at independent
+    # resolutions; kv_res defaults to act_res
+    kv_res = act_res if kv_res is None else kv_res
+    total_params = calculate_total_params(model)[0]
+    kv_cache = calculate_total_KV_cache_size(model, users)[0]
+    activations = calculate_activations(model, input_len, users, context_len)[0]
+
+    weight_storage = (w_res / 8) * total_params * (1 / weight_density) / weight_tiers  # mm²
+    kv_storage = (kv_res / 8) * kv_cache * (1 / kv_density)  # mm²
+    act_storage = (act_res / 8) * activations * (1 / act_density)  # mm²
+
+    return weight_storage, act_storage, kv_storage
+
+
+@instrument
+def calculate_chip_area(model, users, input_len, weight_density, weight_tiers, kv_density, act_density, tmacs_per_mm2, w_res, act_res, kv_res=None, context_len=None):
+    # chip area model of plot_model_chip_requirements; every argument broadcasts; kv_res defaults to act_res
+    # returns total area, weight (LtRAM) area, KV$ + activation (SRAM) area and compute area in mm²
+    weight_storage, act_storage, kv_storage = calculate_storage_area(model, users, input_len, weight_density, weight_tiers, kv_density,
+                                                                     act_density, w_res, act_res, kv_res, context_len)
+
+    total_SRAM_storage_area = kv_storage + act_storage  # mm²
+
+    # compute area
+    peak_flops = calculate_total_flops(model, input_len, users, context_len)[0]
+    compute_area = 2 * peak_flops / 1000 / tmacs_per_mm2  # mm²
+
+    # LtRAM for weights is stacked on top of compute/SRAM which are layed in 2D
+    total_area = np.maximum(total_SRAM_storage_area + compute_area, weight_storage)
+
+    return total_area, weight_storage, total_SRAM_storage_area, compute_area
+
+
+@instrument
+def calculate_num_chips(total_area, chip_size=CHIP_SIZES["reticle"]):
+    return np.ceil(total_area / chip_size)